@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Dict, Type
+
+from agents.base import BotAgent
+from agents.markov import MarkovAgent
+from agents.q_learning import QLearningAgent
+
+DEFAULT_BACKEND = QLearningAgent.backend
+
+# Bot engines a game can use; the name is also part of the model file name (see utils.storage.model_path).
+BACKENDS: Dict[str, Type[BotAgent]] = {cls.backend: cls for cls in (QLearningAgent, MarkovAgent)}
+BACKEND_LABELS: Dict[str, str] = {
+    QLearningAgent.backend: "Q-learning table",
+    MarkovAgent.backend: "Frequency predictor (Markov, backoff)",
+}
+
+
+def backend_class(name: str) -> Type[BotAgent]:
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown bot engine {name!r}, expected one of {sorted(BACKENDS)}") from None
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils import metrics
+
+WAL_SUFFIX = ".wal"
+
+Changes = Dict[str, List[float]]  # state key -> change of each action's value
+
+
+def wal_path(path: str) -> str:
+    """Append-only log of row updates that have not been compacted into the model file yet."""
+    return path + WAL_SUFFIX
+
+
+def merge_changes(first: Changes, second: Changes) -> Changes:
+    """Both `pop_changes` snapshots as one (the changes of a row in both are added)."""
+    merged = dict(first)
+    for key, change in second.items():
+        earlier = merged.get(key)
+        merged[key] = change if earlier is None else [a + b for a, b in zip(earlier, change)]
+    return merged
+
+
+class BotAgent:
+    """
+    What every bot engine (see agents.backends) offers the pages, the server and the model store: epsilon-greedy
+    actions from per-state action values, training on transitions, and a model file with a log of changes.
+
+    Subclasses provide the values (`_lookup`, `_q_matrix`), the updates, `pop_changes` with `_apply_logged`
+    for the log, and `save` / `load`. The learning aids and the state cap are no-ops here: engines that don't
+    use them accept the settings and ignore them.
+    """
+
+    backend = ""  # engine name, also used in the model file name
+
+    def __init__(
+        self,
+        actions: List[str],
+        alpha: float = 0.3,
+        gamma: float = 0.95,
+        epsilon: float = 0.1,
+        state_serializer: Callable[[Any], str] | None = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.actions: List[str] = actions
+        self.action_index: Dict[str, int] = {a: i for i, a in enumerate(actions)}
+        self.alpha: float = alpha
+        self.gamma: float = gamma
+        self.epsilon: float = epsilon
+        self._serialize: Callable[[Any], str] = state_serializer or (lambda s: json.dumps(s, sort_keys=True))
+        self.rng: np.random.Generator = np.random.default_rng(seed)  # exploration and tie-breaking
+        self.trace_decay: float = 0.0
+        self.replay_ratio: float = 0.0
+        self.max_states: Optional[int] = None
+        self.eviction: str = "lru"
+
+    @property
+    def n_states(self) -> int:
+        raise NotImplementedError
+
+    def set_replay(self, ratio: float, capacity: int = 0) -> None:
+        """Replay past transitions after each batch (QLearningAgent); other engines ignore it."""
+        self.replay_ratio = ratio
+
+    def set_capacity(self, max_states: Optional[int], eviction: str = "lru") -> None:
+        """Cap the number of states (QLearningAgent); engines with fixed-size storage have nothing to evict."""
+
+    # --- Values, implemented by the engines ---
+    def _lookup(self, state: Any) -> Sequence[float]:
+        """One state's action values as plain floats, without adding the state."""
+        raise NotImplementedError
+
+    def _q_matrix(self, states: Sequence[Any]) -> np.ndarray:
+        """(states, actions) array of action values, without adding states."""
+        raise NotImplementedError
+
+    def update(self, state: Any, action: str, reward: float, next_state: Any, done: bool) -> None:
+        raise NotImplementedError
+
+    def update_batch(
+        self,
+        states: Sequence[Any],
+        actions: Sequence[str],
+        rewards: Union[float, Sequence[float]],
+        next_states: Sequence[Any],
+        dones: Union[bool, Sequence[bool]],
+        epochs: int = 1,
+    ) -> None:
+        raise NotImplementedError
+
+    # --- Acting ---
+    @metrics.timed("agent.get_q_values")
+    def get_q_values(self, state: Any) -> Dict[str, float]:
+        return dict(zip(self.actions, self._lookup(state)))
+
+    def _greedy(self, q: np.ndarray) -> np.ndarray:
+        """Column of each row's maximum, chosen uniformly at random among tied maxima."""
+        ties = q == q.max(axis=1, keepdims=True)
+        return np.where(ties, self.rng.random(q.shape), -1.0).argmax(axis=1)
+
+    def _greedy_one(self, values: Sequence[float]) -> int:
+        """`_greedy` for one state's values as plain floats: no arrays for a single lookup."""
+        best = max(values)
+        tied = [a for a, v in enumerate(values) if v == best]
+        return tied[0] if len(tied) == 1 else tied[int(self.rng.random() * len(tied))]
+
+    def best_action_value(self, state: Any) -> Tuple[str, float]:
+        values = self._lookup(state)
+        best = self._greedy_one(values)
+        return self.actions[best], float(values[best])
+
+    @metrics.timed("agent.choose_actions")
+    def choose_actions(self, states: Sequence[Any], training: bool = True) -> List[str]:
+        """
+        Epsilon-greedy actions for many states in one vectorized pass (greedy unless `training`).
+        Exploration and tie-breaking draw from `self.rng`, so a seeded agent is reproducible.
+        """
+        if not len(states):
+            return []
+        choice = self._greedy(self._q_matrix(states))
+        if training and self.epsilon > 0:
+            explore = self.rng.random(len(choice)) < self.epsilon
+            choice = np.where(explore, self.rng.integers(len(self.actions), size=len(choice)), choice)
+        return [self.actions[i] for i in choice.tolist()]
+
+    @metrics.timed("agent.choose_action")
+    def choose_action(self, state: Any, training: bool = True) -> str:
+        """`choose_actions` for one state, on plain floats (the vectorized path only pays off for batches)."""
+        if training and self.epsilon > 0 and self.rng.random() < self.epsilon:
+            return self.actions[int(self.rng.random() * len(self.actions))]
+        return self.actions[self._greedy_one(self._lookup(state))]
+
+    # --- Persistence ---
+    def save(self, path: str) -> None:
+        raise NotImplementedError
+
+    def pop_changes(self) -> Changes:
+        """
+        How much each row changed since the last save or snapshot (row key -> change per action); resets the
+        change set. Logging changes rather than values keeps every writer's training of a row when several
+        processes train it at once.
+        """
+        raise NotImplementedError
+
+    def _apply_logged(self, key: str, values: Dict[str, float], added: bool) -> None:
+        """Replay one log record: add `values` (a change) to the row, or set them (`added` False)."""
+        raise NotImplementedError
+
+    @metrics.timed("agent.append_log")
+    def append_log(self, path: str, changes: Optional[Changes] = None) -> int:
+        """
+        Append changed rows to the model's log; returns the number of rows written.
+        By default these are the rows changed since the last save, or pass a snapshot from `pop_changes`.
+        Loading adds the logged changes to the model, so the log keeps everyone's updates of a row.
+        """
+        if changes is None:
+            changes = self.pop_changes()
+        if not changes:
+            return 0
+        lines = [
+            json.dumps({"s": key, "d": dict(zip(self.actions, change))}, sort_keys=True) + "\n"
+            for key, change in changes.items()
+        ]
+        with open(wal_path(path), "a", encoding="utf-8") as f:
+            f.writelines(lines)
+        metrics.add_bytes("agent.append_log", "written", sum(len(line.encode("utf-8")) for line in lines))
+        return len(lines)
+
+    def _replay_log(self, path: str) -> None:
+        try:
+            with open(wal_path(path), "r", encoding="utf-8") as f:
+                metrics.add_bytes("agent.load", "read", os.fstat(f.fileno()).st_size)
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:  # torn line from an interrupted append
+                        continue
+                    added = "d" in record  # a change; logs of older versions hold the new values ("q")
+                    self._apply_logged(record["s"], record["d" if added else "q"], added)
+        except FileNotFoundError:
+            pass
+
+    def _remove_log(self, path: str) -> None:
+        """A full save supersedes the log."""
+        try:
+            os.remove(wal_path(path))
+        except FileNotFoundError:
+            pass
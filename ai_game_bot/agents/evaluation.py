@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from agents.markov import MAX_CONTEXT_ORDER, SMOOTHING, backoff_probabilities, context_keys
+
+Codes = Union[bytes, bytearray, memoryview, Sequence[int], np.ndarray]
+
+CURVE_POINTS = 50  # blocks the learning curve is averaged over
+
+
+class Evaluation(NamedTuple):
+    rounds: int
+    accuracy: float  # share of moves the bot predicted (its action was the target for the human move)
+    outcomes: Optional[Dict[int, float]]  # share of wins (1), draws (0) and losses (-1), if a score matrix was given
+    curve: List[Tuple[int, float]]  # (rounds played, accuracy over the preceding block)
+
+
+def as_codes(codes: Codes) -> np.ndarray:
+    if isinstance(codes, (bytes, bytearray, memoryview)):
+        return np.frombuffer(codes, dtype=np.uint8)
+    return np.asarray(codes, dtype=np.int64)
+
+
+def history_contexts(codes: np.ndarray, n_actions: int, order: int) -> np.ndarray:
+    """
+    Context index before each move and after the last one (len(codes) + 1 entries): the last `order` moves in
+    base n_actions + 1, newest in the lowest digit and 0 for "no move yet", like HistoryEncoder keys.
+    """
+    base = n_actions + 1
+    contexts = np.zeros(len(codes) + 1, dtype=np.int64)
+    digits = codes.astype(np.int64) + 1
+    for lag in range(order):
+        contexts[lag + 1 :] += digits[: len(digits) - lag] * base**lag
+    return contexts
+
+
+def score_matrix(actions: List[str], score: Callable[[str, str], int]) -> np.ndarray:
+    """(bot action, human move) -> 1 / 0 / -1, from a game's scoring function such as rps.play_result."""
+    return np.array([[score(bot, human) for human in actions] for bot in actions], dtype=np.int8)
+
+
+def walk_forward(
+    codes: Codes,
+    n_actions: int,
+    targets: Sequence[int],
+    alpha: float = 0.3,
+    gamma: float = 0.95,
+    epsilon: float = 0.0,
+    order: int = 1,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Replay a move history (action indices) walk-forward against a fresh Q-table: at each step predict
+    epsilon-greedily from the last `order` moves, then learn the move.
+    `targets[code]` is the bot action that is right against human move `code`. The update is the same one
+    QLearningAgent.update applies to HistoryEncoder states; ties are broken with a seeded RNG.
+    Returns the predicted action per move (int8).
+    Contexts, targets and random draws are precomputed as arrays, so the sequential part is a tight loop
+    over plain ints and floats that keeps each row's maximum and argmax current instead of rescanning rows.
+    """
+    codes = as_codes(codes)
+    n = len(codes)
+    span = (n_actions + 1) ** order
+    contexts = history_contexts(codes, n_actions, order)
+    wanted = np.asarray(targets, dtype=np.int64)[codes]
+    rng = np.random.default_rng(seed)
+    tie_draws = iter(rng.random(n).tolist())
+
+    q = [[0.0] * n_actions for _ in range(span)]
+    row_max = [0.0] * span
+    argmax = [-1] * span  # each row's maximum column, or -1 while it is tied
+    predictions = bytearray(n)
+    keep, step, step_gamma = 1 - alpha, alpha, alpha * gamma
+    context = 0
+    for i, (next_context, target) in enumerate(zip(contexts[1:].tolist(), wanted.tolist())):
+        row = q[context]
+        best = row_max[context]
+        pred = argmax[context]
+        if pred < 0:
+            tied = [a for a, v in enumerate(row) if v == best]
+            pred = tied[int(next(tie_draws) * len(tied))]
+        predictions[i] = pred
+        old = row[target]
+        new = keep * old + step + step_gamma * row_max[next_context]
+        row[target] = new
+        if new > best:
+            row_max[context], argmax[context] = new, target
+        elif new == best:
+            argmax[context] = target if row.count(new) == 1 else -1
+        elif old == best:
+            best = row_max[context] = max(row)
+            argmax[context] = row.index(best) if row.count(best) == 1 else -1
+        context = next_context
+
+    predicted = np.frombuffer(predictions, dtype=np.uint8).astype(np.int8)
+    if epsilon > 0:
+        explore = rng.random(n) < epsilon
+        predicted[explore] = rng.integers(n_actions, size=int(explore.sum()))
+    return predicted
+
+
+def markov_walk_forward(
+    codes: Codes,
+    n_actions: int,
+    targets: Sequence[int],
+    order: int = 1,
+    seed: int = 0,
+    max_order: int = MAX_CONTEXT_ORDER,
+    smoothing: float = SMOOTHING,
+) -> np.ndarray:
+    """
+    `walk_forward` for the frequency predictor (agents.markov.MarkovAgent): at each step predict the most
+    likely target after the last `order` moves, backing off through the shorter contexts with the same
+    `smoothing`, then count the move. Returns the predicted action per move (int8).
+    """
+    codes = as_codes(codes)
+    n = len(codes)
+    base = n_actions + 1
+    longest = min(order, max_order)
+    # context keys of orders 0..longest before each move, as MarkovAgent derives them from HistoryEncoder keys
+    digits = history_contexts(codes, n_actions, order)[:n]
+    powers = base ** np.arange(longest + 1, dtype=np.int64)
+    contexts = context_keys(digits, np.full(n, order), powers, longest)
+    wanted = np.asarray(targets, dtype=np.int64)[codes]
+    tie_draws = iter(np.random.default_rng(seed).random(n).tolist())
+
+    counts = [[0.0] * n_actions for _ in range(2 * int(powers[-1]))]
+    totals = [0.0] * len(counts)
+    predictions = bytearray(n)
+    for i, (rows, target) in enumerate(zip(contexts.tolist(), wanted.tolist())):
+        probs = backoff_probabilities(rows, counts, totals, smoothing)
+        best = max(probs)
+        tied = [a for a, p in enumerate(probs) if p == best]
+        predictions[i] = tied[0] if len(tied) == 1 else tied[int(next(tie_draws) * len(tied))]
+        for row in rows:
+            counts[row][target] += 1.0
+            totals[row] += 1.0
+    return np.frombuffer(predictions, dtype=np.uint8).astype(np.int8)
+
+
+def learning_curve(hits: np.ndarray, points: int = CURVE_POINTS) -> List[Tuple[int, float]]:
+    """Accuracy over consecutive blocks of the history, as (rounds played at the block's end, accuracy)."""
+    n = len(hits)
+    if n == 0:
+        return []
+    ends = np.unique(np.linspace(0, n, min(points, n) + 1).astype(np.int64))[1:]
+    starts = np.concatenate(([0], ends[:-1]))
+    totals = np.add.reduceat(hits.astype(np.int64), starts)
+    return list(zip(ends.tolist(), (totals / (ends - starts)).tolist()))
+
+
+def evaluate(
+    codes: Codes,
+    n_actions: int,
+    targets: Sequence[int],
+    scores: Optional[np.ndarray] = None,
+    alpha: float = 0.3,
+    gamma: float = 0.95,
+    epsilon: float = 0.0,
+    order: int = 1,
+    seed: int = 0,
+    points: int = CURVE_POINTS,
+    backend: str = "qtable",
+) -> Evaluation:
+    """
+    Walk-forward accuracy, outcome rates (with a `score_matrix`) and learning curve for one setting of the
+    `backend` engine ("markov": the frequency predictor, which ignores alpha, gamma and epsilon).
+    """
+    codes = as_codes(codes)
+    if backend == "markov":
+        predicted = markov_walk_forward(codes, n_actions, targets, order, seed)
+    else:
+        predicted = walk_forward(codes, n_actions, targets, alpha, gamma, epsilon, order, seed)
+    hits = predicted == np.asarray(targets, dtype=np.int64)[codes]
+    n = max(1, len(codes))
+    outcomes = None
+    if scores is not None:
+        counts = np.bincount(scores[predicted, codes] + 1, minlength=3)
+        outcomes = {1: float(counts[2]) / n, 0: float(counts[1]) / n, -1: float(counts[0]) / n}
+    return Evaluation(len(codes), float(hits.sum()) / n, outcomes, learning_curve(hits, points))
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+START = "START"
+
+
+class HistoryEncoder:
+    """
+    Order-k history state packed into a single int, updated in O(1) per move.
+    The last k moves are base-(|actions| + 1) digits (0 = before the first move, i.e. "START") under a leading
+    sentinel digit, so keys of different orders never collide and one serializer handles them all.
+    `serialize` maps a key to the same string the default JSON serializer gives for the move window, so order-1
+    keys ('"START"', '"rock"', ...) match existing single-move models.
+    """
+
+    def __init__(self, actions: List[str], order: int = 1) -> None:
+        if order < 1:
+            raise ValueError("History order must be at least 1")
+        self.actions: List[str] = list(actions)
+        self.order: int = order
+        self.base: int = len(self.actions) + 1
+        self.span: int = self.base**order
+        self.digit: Dict[str, int] = {a: i + 1 for i, a in enumerate(self.actions)}
+        self._keys: Dict[int, str] = {}
+
+    def start(self) -> int:
+        return self.span
+
+    def push_code(self, key: int, code: int) -> int:
+        """Slide the window forward by one move given as an action index."""
+        return self.span + ((key - self.span) * self.base + code + 1) % self.span
+
+    def push(self, key: int, move: str) -> int:
+        return self.span + ((key - self.span) * self.base + self.digit[move]) % self.span
+
+    def encode(self, moves: Iterable[str]) -> int:
+        """Key for the window ending with the last of `moves` (only the last `order` moves matter)."""
+        key = self.start()
+        for move in moves:
+            key = self.push(key, move)
+        return key
+
+    def transitions(self, moves: Sequence[str], before: Iterable[str] = ()) -> Tuple[List[int], List[int]]:
+        """(state, next state) keys for each of `moves`, continuing from the window that ends with `before`."""
+        key = self.encode(before)
+        states = []
+        for move in moves:
+            states.append(key)
+            key = self.push(key, move)
+        return states, states[1:] + [key] if states else []
+
+    def moves(self, key: int) -> List[str]:
+        """Window of a key, oldest move first, padded with START; works for keys of any order."""
+        window = []
+        while key >= self.base:
+            key, digit = divmod(key, self.base)
+            window.append(self.actions[digit - 1] if digit else START)
+        return window[::-1]
+
+    def label(self, key: int) -> str:
+        return " → ".join(self.moves(key))
+
+    def serialize(self, state: Any) -> str:
+        try:
+            return self._keys[state]
+        except (KeyError, TypeError):
+            pass
+        if type(state) is not int:
+            return json.dumps(state, sort_keys=True)
+        window = self.moves(state)
+        text = self._keys[state] = json.dumps(window[0] if len(window) == 1 else window)
+        return text
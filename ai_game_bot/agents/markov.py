@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from agents.base import BotAgent, Changes
+from agents.q_table import DenseQTable
+from agents.qtable_io import atomic_write, is_binary_path, read_binary, write_binary
+from utils import metrics
+
+MAX_CONTEXT_ORDER = 4  # longest context counted; longer states use their latest moves
+SMOOTHING = 1.0  # pseudo-observations per action that a context's counts are backed off with
+DIRECT_STATES = 32  # up to this many states are predicted along their own contexts instead of rebuilding the table
+
+
+def context_keys(digits: np.ndarray, orders: np.ndarray, powers: np.ndarray, max_order: int) -> np.ndarray:
+    """
+    (states, max_order + 1) context keys from order 0 up, for states whose last `orders` moves are `digits`
+    (newest lowest, in base `powers[1]`): base**j plus the j newest digits, or -1 where a state has fewer moves.
+    """
+    contexts = np.full((len(digits), max_order + 1), -1, dtype=np.int64)
+    for j in range(max_order + 1):
+        power = powers[j]
+        contexts[:, j] = np.where(orders >= j, power + digits % power, -1)
+    return contexts
+
+
+def backoff_probabilities(
+    rows: Iterable[int], counts: Sequence[Sequence[float]], totals: Sequence[float], smoothing: float
+) -> List[float]:
+    """
+    Next-action probabilities of a state from the counts of its context `rows`, order 0 first: each order's
+    counts are smoothed towards the estimate of the order below, weighing `smoothing` observations per action.
+    """
+    n_actions = len(counts[0])
+    weight = smoothing * n_actions
+    probs = [1.0 / n_actions] * n_actions
+    for row in rows:
+        total = totals[row] + weight
+        probs = [(c + weight * p) / total for c, p in zip(counts[row], probs)]
+    return probs
+
+
+class MarkovAgent(BotAgent):
+    """
+    Next-move predictor with the BotAgent interface, for games where the bot's action doesn't
+    influence what happens next. It counts how often each action was the rewarded one after every context
+    of 0..k recent moves and predicts from the longest context, backing off to shorter ones while it has
+    few observations.
+
+    States must be HistoryEncoder keys (ints). Every shorter context is a suffix of the key's digits, and the
+    encoder's sentinel digit keeps keys of different orders apart, so each context is a row of one dense
+    count array indexed by its key: an update adds to k + 1 cells and a prediction reads one row of the
+    backed-off probabilities, with no state strings involved. Batches are handled with vectorized numpy.
+    Values (`get_q_values`) are the predicted probabilities of each action being the rewarded one.
+    alpha and gamma are accepted but unused.
+    """
+
+    backend = "markov"
+
+    def __init__(
+        self,
+        actions: List[str],
+        alpha: float = 0.3,
+        gamma: float = 0.95,
+        epsilon: float = 0.1,
+        state_serializer: Callable[[Any], str] | None = None,
+        seed: Optional[int] = None,
+        max_order: int = MAX_CONTEXT_ORDER,
+        smoothing: float = SMOOTHING,
+    ) -> None:
+        super().__init__(actions, alpha, gamma, epsilon, state_serializer, seed)
+        self.base: int = len(actions) + 1
+        self.max_order: int = max_order
+        self.smoothing: float = smoothing
+        # base**k for every state order whose keys fit in int64; the first max_order + 1 index the contexts
+        self._powers = self.base ** np.arange(int(62 / np.log2(self.base)), dtype=np.int64)
+        self.counts: np.ndarray = np.zeros((2 * int(self._powers[max_order]), len(actions)))
+        self.totals: np.ndarray = np.zeros(len(self.counts))
+        self._dirty: Dict[int, List[float]] = {}  # context keys changed since the last save -> counts before
+        self._row_cache: Dict[Any, Tuple[int, ...]] = {}
+        self._probs: Optional[np.ndarray] = None  # cached _probabilities(), reset by every update
+
+    @property
+    def n_states(self) -> int:
+        return int(np.count_nonzero(self.totals))
+
+    # --- Contexts ---
+    def _orders(self, states: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """(keys, orders) of HistoryEncoder keys: an order-k key is base**k plus k digits, newest lowest."""
+        keys = np.asarray(states)
+        if keys.dtype.kind not in "iu":
+            raise ValueError("MarkovAgent states must be HistoryEncoder keys (ints)")
+        keys = keys.astype(np.int64).reshape(-1)
+        order = np.searchsorted(self._powers, keys, side="right") - 1
+        if keys.size and (keys.min() < 1 or (keys >= 2 * self._powers[order]).any()):
+            raise ValueError("State keys don't match this agent's actions")
+        return keys, order
+
+    def _contexts(self, states: Sequence[Any]) -> np.ndarray:
+        """(states, max_order + 1) context keys from order 0 up; -1 where a state has fewer moves."""
+        keys, order = self._orders(states)
+        return context_keys(keys - self._powers[order], order, self._powers, self.max_order)
+
+    def _longest_context(self, states: Sequence[Any]) -> np.ndarray:
+        keys, order = self._orders(states)
+        longest = np.minimum(order, self.max_order)
+        return self._powers[longest] + (keys - self._powers[order]) % self._powers[longest]
+
+    def _track(self, rows: Iterable[int]) -> None:
+        new = sorted(set(rows).difference(self._dirty))
+        if new:
+            self._dirty.update(zip(new, self.counts[new].tolist()))
+
+    def _context_rows(self, state: Any) -> Tuple[int, ...]:
+        """Context keys of one state (orders 0 up), cached so single updates skip the array work."""
+        rows = self._row_cache.get(state)
+        if rows is None:
+            rows = self._row_cache[state] = tuple(r for r in self._contexts([state])[0].tolist() if r >= 0)
+        return rows
+
+    def _probabilities(self) -> np.ndarray:
+        """
+        Next-action probabilities for every context, backing off from longer contexts to shorter ones: each
+        order's counts are smoothed towards the estimate of the order below (its suffix), weighing `smoothing`
+        observations per action, so a context seen only a few times mostly defers to the shorter one.
+        `backoff_probabilities` for every context at once: rebuilt in one pass over the table after updates, so
+        predicting is a single row lookup per state.
+        """
+        if self._probs is None:
+            n_actions = len(self.actions)
+            weight = self.smoothing * n_actions
+            probs = np.zeros_like(self.counts)
+            probs[1] = (self.counts[1] + self.smoothing) / (self.totals[1] + weight)  # order 0 vs uniform
+            for j in range(1, self.max_order + 1):
+                power, shorter = int(self._powers[j]), int(self._powers[j - 1])
+                parents = shorter + np.arange(power) % shorter
+                rows = slice(power, 2 * power)
+                probs[rows] = (self.counts[rows] + weight * probs[parents]) / (self.totals[rows] + weight)[:, None]
+            self._probs = probs
+        return self._probs
+
+    def _state_probabilities(self, state: Any) -> List[float]:
+        """The same backoff for one state, along its own contexts only (no table rebuild after an update)."""
+        rows = list(self._context_rows(state))
+        counts, totals = self.counts[rows].tolist(), self.totals[rows].tolist()  # plain floats: faster per action
+        return backoff_probabilities(range(len(rows)), counts, totals, self.smoothing)
+
+    # --- Agent interface ---
+    def _lookup(self, state: Any) -> Sequence[float]:
+        if self._probs is None:
+            return self._state_probabilities(state)
+        return self._probs[self._context_rows(state)[-1]].tolist()  # the longest context's row
+
+    def _q_matrix(self, states: Sequence[Any]) -> np.ndarray:
+        if self._probs is None and len(states) <= DIRECT_STATES:
+            return np.array([self._state_probabilities(s) for s in states]).reshape(len(states), len(self.actions))
+        return self._probabilities()[self._longest_context(states)]
+
+    @metrics.timed("agent.update")
+    def update(self, state: Any, action: str, reward: float, next_state: Any, done: bool) -> None:
+        col = self.action_index[action]
+        counts, totals = self.counts, self.totals
+        self._probs = None
+        rows = self._context_rows(state)
+        self._track(rows)
+        for row in rows:
+            counts[row, col] += reward
+            totals[row] += reward
+
+    @metrics.timed("agent.update_batch")
+    def update_batch(
+        self,
+        states: Sequence[Any],
+        actions: Sequence[str],
+        rewards: Union[float, Sequence[float]],
+        next_states: Sequence[Any],
+        dones: Union[bool, Sequence[bool]],
+        epochs: int = 1,
+    ) -> None:
+        """Count each rewarded action in every context of its state (`epochs` times). Next states are unused."""
+        n = len(states)
+        if len(actions) != n or len(next_states) != n:
+            raise ValueError("update_batch sequences must have the same length")
+        if n == 0 or epochs < 1:
+            return
+        weights = np.broadcast_to(np.asarray(rewards, dtype=np.float64), (n,)) * epochs
+        contexts = self._contexts(states)
+        cols = np.fromiter((self.action_index[a] for a in actions), dtype=np.int64, count=n)
+        known = contexts >= 0
+        rows = contexts[known]  # every (state, context) pair, state by state
+        cells = rows * len(self.actions) + np.broadcast_to(cols[:, None], contexts.shape)[known]
+        added = weights.repeat(known.sum(axis=1))
+        self._track(np.unique(rows).tolist())
+        # the tables are small and fixed-size, so one bincount over all cells beats scattered adds
+        self.counts += np.bincount(cells, added, minlength=self.counts.size).reshape(self.counts.shape)
+        self.totals += np.bincount(rows, added, minlength=len(self.totals))
+        self._probs = None
+
+    # --- Persistence: only contexts that were seen are stored, as integer counts keyed by context key ---
+    def _rows(self) -> np.ndarray:
+        return np.flatnonzero(self.totals)
+
+    def to_json(self) -> str:
+        rows = self._rows()
+        counts = self.counts[rows]
+        exact = bool((counts == np.round(counts)).all())
+        values = counts.astype(np.int64).tolist() if exact else counts.tolist()
+        return json.dumps(
+            {
+                "backend": self.backend,
+                "actions": self.actions,
+                "max_order": self.max_order,
+                "smoothing": self.smoothing,
+                "counts": dict(zip(map(str, rows.tolist()), values)),
+            }
+        )
+
+    @classmethod
+    def from_json(cls, data: str, state_serializer: Callable[[Any], str] | None = None) -> "MarkovAgent":
+        payload = json.loads(data)
+        if payload.get("backend") != cls.backend:
+            raise ValueError("Not a Markov predictor model")
+        agent = cls(
+            payload["actions"],
+            state_serializer=state_serializer,
+            max_order=payload["max_order"],
+            smoothing=payload.get("smoothing", SMOOTHING),
+        )
+        agent._set_rows({int(k): v for k, v in payload["counts"].items()})
+        return agent
+
+    def _set_rows(self, rows: Dict[int, Sequence[float]], add: bool = False) -> None:
+        """Set (or with `add`, add to) the counts of context keys."""
+        self._probs = None
+        for key, values in rows.items():
+            if 0 <= key < len(self.counts):
+                self.counts[key] = self.counts[key] + values if add else values
+                self.totals[key] = self.counts[key].sum()
+
+    @metrics.timed("agent.save")
+    def save(self, path: str) -> None:
+        """JSON counts, or a binary table (float32 by default: counts are exact up to 2**24) for `.qtb` paths."""
+        if is_binary_path(path):
+            rows = self._rows()
+            table = DenseQTable(self.actions, capacity=len(rows), dtype=np.float32)
+            for row in rows.tolist():
+                table.row_id(str(row))
+            table.values[: len(rows)] = self.counts[rows]
+            write_binary(path, table)
+        else:
+            with atomic_write(path, "w") as f:
+                f.write(self.to_json())
+        metrics.add_bytes("agent.save", "written", os.path.getsize(path))
+        self._dirty.clear()
+        self._remove_log(path)
+
+    def pop_changes(self) -> Changes:
+        """Counts added to each context since the last save or snapshot (context key -> per action)."""
+        rows = sorted(self._dirty)
+        current = self.counts[rows].tolist() if rows else []
+        changes = {
+            str(row): [new - old for new, old in zip(counts, self._dirty[row])] for row, counts in zip(rows, current)
+        }
+        self._dirty.clear()
+        return changes
+
+    def _apply_logged(self, key: str, values: Dict[str, float], added: bool) -> None:
+        self._set_rows({int(key): [values.get(a, 0.0) for a in self.actions]}, add=added)
+
+    @classmethod
+    @metrics.timed("agent.load")
+    def load(
+        cls, path: str, actions: List[str], state_serializer: Callable[[Any], str] | None = None
+    ) -> "MarkovAgent":
+        """Load the model file (if any) and replay its transaction log on top."""
+        try:
+            if is_binary_path(path):
+                table = read_binary(path)
+                rows = {int(key): values for key, values in table.items()}
+                # binary tables don't record max_order: make room for the longest context stored
+                base, longest = len(table.actions) + 1, MAX_CONTEXT_ORDER
+                while base ** (longest + 1) <= max(rows, default=1):
+                    longest += 1
+                agent = cls(table.actions, state_serializer=state_serializer, max_order=longest)
+                agent._set_rows(rows)
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    metrics.add_bytes("agent.load", "read", os.fstat(f.fileno()).st_size)
+                    agent = cls.from_json(f.read(), state_serializer=state_serializer)
+        except FileNotFoundError:
+            agent = cls(actions=actions, state_serializer=state_serializer)
+        agent._replay_log(path)
+        return agent
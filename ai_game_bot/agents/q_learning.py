@@ -1,16 +1,38 @@
 from __future__ import annotations
 
 import json
-import random
-from typing import Any, Callable, Dict, List, Tuple
+import math
+import os
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 
-class QLearningAgent:
+from agents.base import BotAgent, Changes
+from agents.q_table import DenseQTable
+from agents.qtable_io import atomic_write, is_binary_path, read_binary, write_binary
+from agents.replay import REPLAY_CAPACITY, PrioritizedReplay
+from utils import metrics
+
+EVICTION_POLICIES = ("lru", "least-visited")
+EVICTION_BATCH = 0.1  # when over capacity, evict this fraction of it at once so eviction is amortized
+TRACE_CUTOFF = 0.01  # eligibility traces are dropped once (gamma * lambda)^age falls below this
+MAX_TRACE = 64  # most recent state-action pairs a trace reaches back to
+
+
+class QLearningAgent(BotAgent):
     """
     Simple tabular Q-learning agent for discrete state/action spaces.
     States are serialized to strings using the provided serializer so we can save to JSON.
+    Values are stored in a DenseQTable (one array row per state, one column per action).
+    Lookups never add rows: an unseen state reads as all zeros until it is trained. With `max_states`,
+    the table is kept within that many states by evicting least recently used or least visited ones.
+    Optional sample-efficiency aids for `update_batch`: Watkins Q(lambda) eligibility traces
+    (`trace_decay`) and a prioritized replay of past transitions (`set_replay`).
     """
 
+    backend = "qtable"  # engine name (see agents.backends), also used in the model file name
+
     def __init__(
         self,
         actions: List[str],
@@ -18,64 +40,336 @@ class QLearningAgent:
         gamma: float = 0.95,
         epsilon: float = 0.1,
         state_serializer: Callable[[Any], str] | None = None,
+        max_states: Optional[int] = None,
+        eviction: str = "lru",
+        seed: Optional[int] = None,
+        trace_decay: float = 0.0,
     ) -> None:
-        self.actions: List[str] = actions
-        self.alpha: float = alpha
-        self.gamma: float = gamma
-        self.epsilon: float = epsilon
-        self._q: Dict[str, Dict[str, float]] = {}
-        self._serialize: Callable[[Any], str] = state_serializer or (lambda s: json.dumps(s, sort_keys=True))
+        super().__init__(actions, alpha, gamma, epsilon, state_serializer, seed)
+        self._q: DenseQTable = DenseQTable(actions)
+        self._dirty: Dict[int, List[float]] = {}  # rows changed since the last save/append_log -> values before
+        self._unseen: Tuple[float, ...] = (0.0,) * len(actions)  # values of any state not in the table
+        self.eviction = eviction
+        self.evictions: int = 0
+        if max_states is not None:
+            self.set_capacity(max_states, eviction)
+        self.trace_decay = trace_decay  # lambda; 0 is plain one-step Q-learning
+        self.replay: Optional[PrioritizedReplay] = None
+        self.replayed: int = 0
+
+    @property
+    def n_states(self) -> int:
+        return len(self._q)
+
+    def set_replay(self, ratio: float, capacity: int = REPLAY_CAPACITY) -> None:
+        """
+        After each `update_batch`, replay `ratio` transitions per new one (0: no replay), sampled from the
+        last `capacity` transitions and favouring those with large TD errors.
+        """
+        if ratio < 0 or capacity < 1:
+            raise ValueError("Replay ratio must not be negative and capacity must be at least 1")
+        if not ratio:
+            self.replay = None
+        elif self.replay is None or self.replay.capacity != capacity:
+            self.replay = PrioritizedReplay(capacity)
+        self.replay_ratio = ratio
+
+    def set_capacity(self, max_states: Optional[int], eviction: str = "lru") -> None:
+        """Limit the table to `max_states` states (None: unbounded), evicting by `eviction` when it overflows."""
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {eviction!r}, expected one of {EVICTION_POLICIES}")
+        if max_states is not None and max_states < 1:
+            raise ValueError("max_states must be at least 1")
+        self.max_states, self.eviction = max_states, eviction
+        if max_states is not None:
+            self._q.track_usage()
+            self._enforce_capacity()
+
+    def _enforce_capacity(self, incoming: int = 0) -> None:
+        """Evict if the table plus `incoming` new states would exceed `max_states`."""
+        if self.max_states is None or len(self._q) + incoming <= self.max_states:
+            return
+        n = len(self._q) + incoming - self.max_states + int(self.max_states * EVICTION_BATCH)
+        moved = self._q.evict(n, self.eviction)
+        self.evictions += sum(1 for new in moved.values() if new < 0)
+        # evicted rows' pending changes are dropped with them; moved rows keep theirs
+        self._dirty = {moved.get(row, row): before for row, before in self._dirty.items() if moved.get(row, row) >= 0}
+
+    def _room(self) -> int:
+        """How many new states fit under `max_states` (evicting first if the table is full)."""
+        if self.max_states is None:
+            return sys.maxsize
+        self._enforce_capacity(1)
+        return self.max_states - len(self._q)
 
     # --- Core Q-learning operations ---
-    def _ensure_state(self, state_key: str) -> Dict[str, float]:
-        if state_key not in self._q:
-            self._q[state_key] = {a: 0.0 for a in self.actions}
-        return self._q[state_key]
-
-    def get_q_values(self, state: Any) -> Dict[str, float]:
-        key = self._serialize(state)
-        return self._ensure_state(key)
-
-    def best_action_value(self, state: Any) -> Tuple[str, float]:
-        q_values = self.get_q_values(state)
-        # break ties randomly for stability
-        best_a = max(q_values, key=lambda a: (q_values[a], random.random()))
-        return best_a, q_values[best_a]
-
-    def choose_action(self, state: Any, training: bool = True) -> str:
-        if training and random.random() < self.epsilon:
-            return random.choice(self.actions)
-        best_a, _ = self.best_action_value(state)
-        return best_a
+    def _ensure_state(self, state_key: str) -> int:
+        return self._q.row_id(state_key)
+
+    def _track(self, rows: Iterable[int]) -> None:
+        """Remember the values of rows about to change, so `pop_changes` can report how much they changed."""
+        new = sorted(set(rows).difference(self._dirty))
+        if new:
+            self._dirty.update(zip(new, self._q.values[new].tolist()))
+
+    def _lookup(self, state: Any) -> Sequence[float]:
+        """Current values for `state` without inserting it."""
+        row = self._q.get(self._serialize(state))
+        if row is None:
+            return self._unseen
+        self._q.touch([row])
+        return self._q.values[row].tolist()
+
+    def _q_matrix(self, states: Sequence[Any]) -> np.ndarray:
+        """(states, actions) array of current values; unseen states are zero rows and are not inserted."""
+        get, serialize = self._q.get, self._serialize
+
+        def row_of(state: Any) -> int:
+            row = get(serialize(state))
+            return -1 if row is None else row
+
+        rows = np.fromiter((row_of(s) for s in states), dtype=np.int64, count=len(states))
+        q = np.zeros((len(rows), len(self.actions)))
+        known = rows >= 0
+        if known.any():
+            q[known] = self._q.values[rows[known]]
+            self._q.touch(rows[known])
+        return q
 
+    @metrics.timed("agent.update")
     def update(self, state: Any, action: str, reward: float, next_state: Any, done: bool) -> None:
         state_key = self._serialize(state)
         next_key = self._serialize(next_state)
-        q_values = self._ensure_state(state_key)
-        next_values = self._ensure_state(next_key)
-        max_next = 0.0 if done else max(next_values.values())
+        row = self._ensure_state(state_key)
+        next_row = self._q.get(next_key)  # an unseen next state counts as all zeros; it isn't added
+        values = self._q.values
+        col = self._q.action_index[action]
+        max_next = 0.0 if done or next_row is None else float(values[next_row].max())
         target = reward + self.gamma * max_next
-        q_values[action] = (1 - self.alpha) * q_values[action] + self.alpha * target
+        self._track((row,))
+        values[row, col] = (1 - self.alpha) * float(values[row, col]) + self.alpha * target
+        self._q.touch([row])
+        self._enforce_capacity()
+
+    @metrics.timed("agent.update_batch")
+    def update_batch(
+        self,
+        states: Sequence[Any],
+        actions: Sequence[str],
+        rewards: Union[float, Sequence[float]],
+        next_states: Sequence[Any],
+        dones: Union[bool, Sequence[bool]],
+        epochs: int = 1,
+    ) -> None:
+        """
+        Apply `update` to each transition in order, `epochs` times over the sequence.
+        States are serialized and interned once per batch and the touched rows are updated as plain
+        floats, so the result is identical to calling `update` in a loop.
+        With `trace_decay` > 0 consecutive transitions (each one's next state is the following one's
+        state) are learned with Watkins Q(lambda): every TD error is also credited to the recent
+        state-action pairs, and the trace is cut where the taken action isn't greedy. With a replay
+        buffer, the batch is then added to it and sampled transitions are replayed.
+        With `max_states`, a batch with more transitions than there is room for new states is learned in
+        consecutive chunks (each for all `epochs`), evicting between them, so the cap holds throughout.
+        """
+        n = len(states)
+        if isinstance(rewards, (int, float)):
+            rewards = [rewards] * n
+        if isinstance(dones, bool):
+            dones = [dones] * n
+        if not (len(actions) == len(rewards) == len(next_states) == len(dones) == n):
+            raise ValueError("update_batch sequences must have the same length")
+        if n == 0 or epochs < 1:
+            return
+        if self._room() < n:
+            start = 0
+            while start < n:
+                end = start + self._room()
+                chunk = slice(start, end)
+                self.update_batch(
+                    states[chunk], actions[chunk], rewards[chunk], next_states[chunk], dones[chunk], epochs
+                )
+                start = end
+            return
+
+        serialized: Dict[Any, str] = {}
+
+        def key_of(state: Any) -> str:
+            try:
+                key = serialized.get(state)
+            except TypeError:  # unhashable state, serialize every time
+                return self._serialize(state)
+            if key is None:
+                key = serialized[state] = self._serialize(state)
+            return key
+
+        keys = [key_of(state) for state in states]
+        next_keys = [key_of(state) for state in next_states]
+        rows = [self._ensure_state(key) for key in keys]
+        # Next states are only read: ones that are not (and won't be) trained stay out of the table as zeros.
+        next_rows = [self._q.get(key) for key in next_keys]
+        cols = [self._q.action_index[a] for a in actions]
+
+        local, q_rows, next_q_rows = self._local_rows(rows, next_rows)
+        transitions = list(zip(q_rows, cols, rewards, next_q_rows, dones))
+        if self.trace_decay > 0:
+            follows = [r is not None and r == s and not d for r, s, d in zip(next_rows, rows[1:], dones)]
+            self._learn_traces(transitions, follows, epochs)
+        else:
+            alpha, gamma = self.alpha, self.gamma
+            for _ in range(epochs):
+                for q, col, reward, next_q, done in transitions:
+                    max_next = 0.0 if done else max(next_q)
+                    target = reward + gamma * max_next
+                    q[col] = (1 - alpha) * q[col] + alpha * target
+        self._track(rows)
+        self._q.values[list(local)] = list(local.values())
+        self._q.touch(rows)
+        if self.replay is not None:
+            self.replay.add(keys, cols, rewards, next_keys, dones)
+            self.replay_updates(int(round(n * self.replay_ratio)))
+        self._enforce_capacity()
+
+    def _local_rows(
+        self, rows: List[int], next_rows: List[Optional[int]]
+    ) -> Tuple[Dict[int, List[float]], List[List[float]], List[List[float]]]:
+        """Touched rows as plain float lists (row -> values), plus the lists for `rows` and `next_rows`."""
+        touched = sorted(set(rows).union(r for r in next_rows if r is not None))
+        local = dict(zip(touched, self._q.values[touched].tolist()))
+        unseen = list(self._unseen)
+        return local, [local[r] for r in rows], [unseen if r is None else local[r] for r in next_rows]
+
+    def _learn_traces(self, transitions: List[tuple], follows: List[bool], epochs: int) -> None:
+        """
+        Watkins Q(lambda) with replacing traces over `transitions`; `follows[i]`: i + 1 continues from i.
+        A pair's eligibility is (gamma * lambda)^age, age being the steps since its latest visit; pairs
+        older than the cutoff depth drop out of the trace.
+        """
+        alpha, gamma = self.alpha, self.gamma
+        decay = gamma * self.trace_decay
+        depth = MAX_TRACE if decay >= 1 else max(1, min(MAX_TRACE, math.ceil(math.log(TRACE_CUTOFF, decay))))
+        weights = [decay**age for age in range(depth)]
+        last = len(transitions) - 1
+        for _ in range(epochs):
+            # (id of the row's values, column) -> (row values, column, step of the latest visit)
+            trace: Dict[Tuple[int, int], Tuple[List[float], int, int]] = {}
+            for i, (q, col, reward, next_q, done) in enumerate(transitions):
+                max_next = 0.0 if done else max(next_q)
+                delta = reward + gamma * max_next - q[col]
+                trace[id(q), col] = (q, col, i)  # replacing: a revisited pair restarts at age 0
+                step = alpha * delta
+                expired = []
+                for pair, (tq, tc, visited) in trace.items():
+                    age = i - visited
+                    if age >= depth:
+                        expired.append(pair)
+                    else:
+                        tq[tc] += step * weights[age]
+                for pair in expired:
+                    del trace[pair]
+                if i == last or not follows[i]:
+                    trace = {}
+                else:
+                    # Watkins: the trace only carries over if the next action taken is a greedy one
+                    next_col = transitions[i + 1][1]
+                    if next_q[next_col] < max(next_q):
+                        trace = {}
+
+    def replay_updates(self, count: int) -> int:
+        """Apply `count` one-step updates to transitions sampled from the replay buffer; returns how many."""
+        replay = self.replay
+        if replay is None or not len(replay) or count < 1:
+            return 0
+        if self._room() < count:
+            replayed = 0
+            while replayed < count:
+                replayed += self.replay_updates(min(count - replayed, self._room()))
+            return replayed
+        slots, weights = replay.sample(count, self.rng)
+        rows = [self._ensure_state(key) for key in replay.states[slots]]
+        next_rows = [self._q.get(key) for key in replay.next_states[slots]]
+        local, q_rows, next_q_rows = self._local_rows(rows, next_rows)
+        alpha, gamma = self.alpha, self.gamma
+        errors = []
+        for q, col, reward, next_q, done, weight in zip(
+            q_rows,
+            replay.actions[slots].tolist(),
+            replay.rewards[slots].tolist(),
+            next_q_rows,
+            replay.dones[slots].tolist(),
+            weights.tolist(),
+        ):
+            delta = reward + (0.0 if done else gamma * max(next_q)) - q[col]
+            q[col] += alpha * weight * delta
+            errors.append(delta)
+        self._track(rows)
+        self._q.values[list(local)] = list(local.values())
+        replay.update_priorities(slots, errors)
+        self._q.touch(rows)
+        self.replayed += count
+        return count
 
     # --- Persistence ---
     def to_json(self) -> str:
-        return json.dumps({"actions": self.actions, "q": self._q}, sort_keys=True)
+        return json.dumps({"actions": self.actions, "q": self._q.to_dict()}, sort_keys=True)
 
     @classmethod
-    def from_json(cls, data: str) -> "QLearningAgent":
+    def from_json(cls, data: str, state_serializer: Callable[[Any], str] | None = None) -> "QLearningAgent":
         payload = json.loads(data)
-        agent = cls(actions=payload["actions"])  # use defaults for hyperparams
-        agent._q = {k: {a: float(v) for a, v in row.items()} for k, row in payload["q"].items()}
+        agent = cls(actions=payload["actions"], state_serializer=state_serializer)  # use defaults for hyperparams
+        agent._q = DenseQTable.from_dict(agent.actions, payload["q"])
         return agent
 
+    @metrics.timed("agent.save")
     def save(self, path: str) -> None:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(self.to_json())
+        """
+        Save the full table to JSON, or to the memory-mappable binary format if `path` ends with `.qtb`.
+        The file is replaced atomically. A full save supersedes the transaction log, which is removed.
+        """
+        if is_binary_path(path):
+            write_binary(path, self._q)
+        else:
+            with atomic_write(path, "w") as f:
+                f.write(self.to_json())
+        metrics.add_bytes("agent.save", "written", os.path.getsize(path))
+        self._dirty.clear()
+        self._remove_log(path)
+
+    def pop_changes(self) -> Changes:
+        table = self._q
+        rows = sorted(self._dirty)
+        current = table.values[rows].tolist() if rows else []
+        changes = {
+            table.key(row): [new - old for new, old in zip(values, self._dirty[row])]
+            for row, values in zip(rows, current)
+        }
+        self._dirty.clear()
+        return changes
+
+    def _apply_logged(self, key: str, values: Dict[str, float], added: bool) -> None:
+        row = self._q.row(key)  # a view: writes go to the table
+        for a, v in values.items():
+            col = self._q.action_index.get(a)
+            if col is not None:
+                row[col] = row[col] + float(v) if added else float(v)
 
     @classmethod
-    def load(cls, path: str, actions: List[str]) -> "QLearningAgent":
+    @metrics.timed("agent.load")
+    def load(
+        cls, path: str, actions: List[str], state_serializer: Callable[[Any], str] | None = None
+    ) -> "QLearningAgent":
+        """Load the model file (if any) and replay its transaction log on top."""
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                return cls.from_json(f.read())
+            if is_binary_path(path):
+                table = read_binary(path)
+                agent = cls(actions=table.actions, state_serializer=state_serializer)
+                agent._q = table
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    # binary models are memory-mapped and paged in on use, so only JSON reads are counted
+                    metrics.add_bytes("agent.load", "read", os.fstat(f.fileno()).st_size)
+                    agent = cls.from_json(f.read(), state_serializer=state_serializer)
         except FileNotFoundError:
-            return cls(actions=actions)
+            agent = cls(actions=actions, state_serializer=state_serializer)
+        agent._replay_log(path)
+        return agent
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import zlib
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class DenseQTable:
+    """
+    Contiguous Q-table: state keys are interned to row ids and all values live in a
+    single (states, actions) float array. Capacity grows by doubling so inserts are amortized O(1).
+    With `track_usage`, per-row visit counts and last-use ticks are kept for eviction (see `evict`).
+    """
+
+    visits: Optional[np.ndarray] = None  # times each row was used, once usage is tracked
+    last_used: Optional[np.ndarray] = None  # `clock` value at each row's latest use
+    clock: int = 0
+
+    def __init__(self, actions: List[str], capacity: int = 16, dtype: type = np.float64) -> None:
+        self.actions: List[str] = list(actions)
+        self.action_index: Dict[str, int] = {a: i for i, a in enumerate(self.actions)}
+        self.index: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.values: np.ndarray = np.zeros((max(1, capacity), len(self.actions)), dtype=dtype)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys)
+
+    def _grow(self, min_rows: int) -> None:
+        capacity = self.values.shape[0]
+        while capacity < min_rows:
+            capacity *= 2
+        grown = np.zeros((capacity, self.values.shape[1]), dtype=self.values.dtype)
+        grown[: len(self)] = self.values[: len(self)]
+        self.values = grown
+        if self.visits is not None:
+            self.visits = np.concatenate([self.visits, np.zeros(capacity - len(self.visits), dtype=np.int64)])
+            self.last_used = np.concatenate([self.last_used, np.zeros(capacity - len(self.last_used), dtype=np.int64)])
+
+    def get(self, key: str) -> Optional[int]:
+        return self.index.get(key)
+
+    def key(self, row: int) -> str:
+        return self.keys[row]
+
+    def row_id(self, key: str) -> int:
+        """Return the row for `key`, inserting a zero row if the state is new."""
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row >= self.values.shape[0]:
+                self._grow(row + 1)
+            self.index[key] = row
+            self.keys.append(key)
+        return row
+
+    def row(self, key: str) -> np.ndarray:
+        row = self.row_id(key)  # may grow (replace) self.values, so index it afterwards
+        return self.values[row]
+
+    # --- Usage tracking and eviction ---
+    def track_usage(self) -> None:
+        if self.visits is None:
+            self.visits = np.zeros(self.values.shape[0], dtype=np.int64)
+            self.last_used = np.zeros(self.values.shape[0], dtype=np.int64)
+
+    def touch(self, rows: Sequence[int]) -> None:
+        if self.visits is not None:
+            np.add.at(self.visits, rows, 1)
+            self.clock += 1
+            self.last_used[rows] = self.clock
+
+    def evict(self, n: int, policy: str = "lru") -> Dict[int, int]:
+        """
+        Remove the `n` least recently used ("lru") or least visited ("least-visited") rows.
+        Rows from the end move into the gaps; returns {old row: new row} for them (removed rows map to -1).
+        """
+        size = len(self.keys)
+        n = min(n, size)
+        if n <= 0:
+            return {}
+        if self.visits is None:
+            raise ValueError("Usage is not tracked for this table (call track_usage first)")
+        usage = self.last_used if policy == "lru" else self.visits
+        removed = np.argpartition(usage[:size], n - 1)[:n].tolist() if n < size else list(range(size))
+        return self.remove(removed)
+
+    def remove(self, rows: Sequence[int]) -> Dict[int, int]:
+        removed = set(rows)
+        size = len(self.keys)
+        new_size = size - len(removed)
+        holes = sorted(r for r in removed if r < new_size)
+        movers = [r for r in range(new_size, size) if r not in removed]
+        for row in removed:
+            del self.index[self.keys[row]]
+        arrays = [self.values] + ([self.visits, self.last_used] if self.visits is not None else [])
+        for array in arrays:
+            array[holes] = array[movers]
+            array[new_size:size] = 0  # new rows must start from zero
+        for old, new in zip(movers, holes):
+            key = self.keys[new] = self.keys[old]
+            self.index[key] = new
+        del self.keys[new_size:]
+        mapping = dict.fromkeys(removed, -1)
+        mapping.update(zip(movers, holes))
+        return mapping
+
+    def items(self) -> Iterator[Tuple[str, np.ndarray]]:
+        for row, key in enumerate(self.keys):
+            yield key, self.values[row]
+
+    # --- Conversion to/from the nested dict layout used by the JSON files ---
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        rows = self.values[: len(self.keys)].tolist()
+        return {key: dict(zip(self.actions, row)) for key, row in zip(self.keys, rows)}
+
+    @classmethod
+    def from_dict(cls, actions: List[str], q: Dict[str, Dict[str, float]]) -> "DenseQTable":
+        table = cls(actions, capacity=max(16, len(q)))
+        for key, row in q.items():
+            values = table.row(key)
+            for a, v in row.items():
+                col = table.action_index.get(a)
+                if col is not None:
+                    values[col] = float(v)
+        return table
+
+
+def key_hash(raw: bytes) -> int:
+    """Hash of a utf-8 state key for the binary format's key index (stable across processes)."""
+    return zlib.crc32(raw)
+
+
+class MappedQTable(DenseQTable):
+    """
+    DenseQTable whose values are a copy-on-write memory map of a binary model file.
+    Lookups probe the file's hashed key index in place, so opening is O(1) and a lookup only reads the pages
+    holding the slots and keys it compares. Rows added after loading are indexed in memory. Operations over
+    all states (iteration, eviction, saving) decode the full index once; so does any lookup in a file written
+    before the key index existed (`slots` is None).
+    """
+
+    def __init__(
+        self,
+        actions: List[str],
+        values: np.ndarray,
+        key_offsets: np.ndarray,
+        key_blob: np.ndarray,
+        slots: Optional[np.ndarray] = None,
+    ) -> None:
+        self.actions = list(actions)
+        self.action_index = {a: i for i, a in enumerate(self.actions)}
+        self.values = values
+        self._key_offsets = key_offsets
+        self._key_blob = key_blob
+        self._slots = slots  # open-addressing table of row ids (-1: empty), probed linearly from key_hash
+        self._n_states = len(key_offsets) - 1
+        self._added: Dict[str, int] = {}  # rows inserted since loading, while the file's index is used
+        self._added_keys: List[str] = []
+
+    def __getattr__(self, name: str) -> object:
+        # Only called while `index`/`keys` have not been materialized yet.
+        if name not in ("index", "keys"):
+            raise AttributeError(name)
+        offsets = self._key_offsets.tolist()
+        blob = self._key_blob.tobytes()
+        keys = [blob[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(self._n_states)] + self._added_keys
+        self.keys = keys
+        self.index = {key: row for row, key in enumerate(keys)}
+        return self.__dict__[name]
+
+    def _in_file_index(self) -> bool:
+        return self._slots is not None and "index" not in self.__dict__
+
+    def __len__(self) -> int:
+        if "keys" in self.__dict__:
+            return len(self.__dict__["keys"])
+        return self._n_states + len(self._added_keys)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def _file_key(self, row: int) -> str:
+        start, end = int(self._key_offsets[row]), int(self._key_offsets[row + 1])
+        return self._key_blob[start:end].tobytes().decode("utf-8")
+
+    def key(self, row: int) -> str:
+        if not self._in_file_index():
+            return self.keys[row]
+        return self._file_key(row) if row < self._n_states else self._added_keys[row - self._n_states]
+
+    def get(self, key: str) -> Optional[int]:
+        if not self._in_file_index():
+            return self.index.get(key)
+        row = self._added.get(key)
+        if row is not None:
+            return row
+        raw = key.encode("utf-8")
+        slots, offsets, blob = self._slots, self._key_offsets, self._key_blob
+        mask = len(slots) - 1
+        slot = key_hash(raw) & mask
+        while True:
+            row = int(slots[slot])
+            if row < 0:
+                return None
+            if blob[int(offsets[row]) : int(offsets[row + 1])].tobytes() == raw:
+                return row
+            slot = (slot + 1) & mask
+
+    def row_id(self, key: str) -> int:
+        if not self._in_file_index():
+            return super().row_id(key)
+        row = self.get(key)
+        if row is None:
+            row = len(self)
+            if row >= self.values.shape[0]:
+                self._grow(row + 1)
+            self._added[key] = row
+            self._added_keys.append(key)
+        return row
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import struct
+import tempfile
+from typing import IO, Iterator, List, Optional
+
+import numpy as np
+
+from agents.q_table import DenseQTable, MappedQTable, key_hash
+
+# Binary Q-table layout (little endian):
+#   header      MAGIC, version, value itemsize, n_actions, n_states, key blob size, values offset, n_slots
+#   actions     n_actions x (u16 length + utf-8 bytes)
+#   state index (n_states + 1) uint64 offsets into the key blob, then the utf-8 key blob
+#   key index   8-byte aligned n_slots int64 row ids (-1: empty), open addressing from key_hash (version 2)
+#   values      8-byte aligned (n_states, n_actions) float32/float64 block at `values offset`
+# Version 1 files have no n_slots field and no key index; they are still read.
+MAGIC = b"QTBL"
+VERSION = 2
+BINARY_EXT = ".qtb"
+_HEADER = struct.Struct("<4sHHIQQQQ")
+_HEADER_V1 = struct.Struct("<4sHHIQQQ")
+_DTYPES = {4: np.dtype("<f4"), 8: np.dtype("<f8")}
+SLOT_LOAD = 0.5  # the key index has at least twice as many slots as states, so probes stay short
+
+
+def is_binary_path(path: str) -> bool:
+    return path.endswith(BINARY_EXT)
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, mode: str = "wb") -> Iterator[IO]:
+    """
+    Write `path` through a temp file in the same directory that replaces it only once complete, so readers
+    (including ones that have the old file memory-mapped) never see a partial file.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        # mkstemp creates the file private; keep the mode of the file being replaced instead
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def write_binary(path: str, table: DenseQTable, dtype: Optional[str] = None) -> None:
+    value_dtype = np.dtype(dtype or table.values.dtype).newbyteorder("<")
+    if value_dtype.itemsize not in _DTYPES:
+        raise ValueError(f"Unsupported value dtype: {value_dtype}")
+    n_states = len(table)
+    action_bytes = b"".join(
+        struct.pack("<H", len(raw)) + raw for raw in (a.encode("utf-8") for a in table.actions)
+    )
+    encoded_keys = [key.encode("utf-8") for key in table.keys]
+    offsets = np.zeros(n_states + 1, dtype="<u8")
+    np.cumsum([len(k) for k in encoded_keys], out=offsets[1:])
+    key_blob = b"".join(encoded_keys)
+    slots = build_key_index(encoded_keys)
+
+    index_start = _HEADER.size + len(action_bytes)
+    slots_offset = index_start + offsets.nbytes + len(key_blob)
+    padding = -slots_offset % 8
+    values_offset = slots_offset + padding + slots.nbytes
+    header = _HEADER.pack(
+        MAGIC, VERSION, value_dtype.itemsize, len(table.actions), n_states, len(key_blob), values_offset, len(slots)
+    )
+
+    with atomic_write(path) as f:
+        f.write(header)
+        f.write(action_bytes)
+        f.write(offsets.tobytes())
+        f.write(key_blob)
+        f.write(b"\0" * padding)
+        f.write(slots.tobytes())
+        f.write(np.ascontiguousarray(table.values[:n_states], dtype=value_dtype).tobytes())
+
+
+def build_key_index(encoded_keys: List[bytes]) -> np.ndarray:
+    """Open-addressing hash table of row ids (linear probing), a power of two of at least n / SLOT_LOAD slots."""
+    n_slots = 1
+    while n_slots * SLOT_LOAD < max(1, len(encoded_keys)):
+        n_slots *= 2
+    mask = n_slots - 1
+    slots = [-1] * n_slots
+    for row, raw in enumerate(encoded_keys):
+        slot = key_hash(raw) & mask
+        while slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        slots[slot] = row
+    return np.array(slots, dtype="<i8")
+
+
+def read_binary(path: str) -> DenseQTable:
+    """Open a binary model; values and the key index are memory-mapped, keys are only read when compared."""
+    with open(path, "rb") as f:
+        head = f.read(_HEADER.size)
+        version = struct.unpack_from("<H", head, 4)[0] if len(head) >= 6 else 0
+        header = _HEADER if version == VERSION else _HEADER_V1
+        if len(head) < header.size:
+            raise ValueError(f"{path} is not a supported binary Q-table")
+        magic, version, itemsize, n_actions, n_states, blob_size, values_offset, *rest = header.unpack(
+            head[: header.size]
+        )
+        if magic != MAGIC or version not in (1, VERSION) or itemsize not in _DTYPES:
+            raise ValueError(f"{path} is not a supported binary Q-table")
+        n_slots = rest[0] if rest else 0
+        f.seek(header.size)
+        actions: List[str] = []
+        for _ in range(n_actions):
+            (length,) = struct.unpack("<H", f.read(2))
+            actions.append(f.read(length).decode("utf-8"))
+        index_start = f.tell()
+
+    if n_states == 0:
+        return DenseQTable(actions, dtype=_DTYPES[itemsize].type)
+    offsets = np.memmap(path, dtype="<u8", mode="r", offset=index_start, shape=(n_states + 1,))
+    blob_start = index_start + offsets.nbytes
+    key_blob = np.memmap(path, dtype=np.uint8, mode="r", offset=blob_start, shape=(max(1, blob_size),))
+    values = np.memmap(path, dtype=_DTYPES[itemsize], mode="c", offset=values_offset, shape=(n_states, n_actions))
+    slots = None
+    if n_slots:
+        slots_offset = values_offset - n_slots * 8
+        slots = np.memmap(path, dtype="<i8", mode="r", offset=slots_offset, shape=(n_slots,))
+    return MappedQTable(actions, values, offsets, key_blob[:blob_size], slots)
+
+
+def convert(src: str, dst: str, dtype: Optional[str] = None) -> None:
+    """Convert a model file between the JSON and binary formats (chosen by extension)."""
+    if is_binary_path(src):
+        table = read_binary(src)
+    else:
+        with open(src, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        table = DenseQTable.from_dict(payload["actions"], payload["q"])
+    if is_binary_path(dst):
+        write_binary(dst, table, dtype=dtype)
+    else:
+        with atomic_write(dst, "w") as f:
+            f.write(json.dumps({"actions": table.actions, "q": table.to_dict()}, sort_keys=True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert Q-table model files between JSON and binary (.qtb).")
+    parser.add_argument("src", help="source model file")
+    parser.add_argument("dst", nargs="?", help="destination (default: src with the other extension)")
+    parser.add_argument("--dtype", choices=["float32", "float64"], help="value precision for binary output")
+    args = parser.parse_args()
+    dst = args.dst
+    if dst is None:
+        stem = os.path.splitext(args.src)[0]
+        dst = stem + (".json" if is_binary_path(args.src) else BINARY_EXT)
+    convert(args.src, dst, dtype=args.dtype)
+    print(f"{args.src} -> {dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+PRIORITY_EPS = 1e-3  # keeps transitions with zero TD error sampleable
+REPLAY_CAPACITY = 5000  # default number of transitions kept
+
+
+class PrioritizedReplay:
+    """
+    Bounded experience replay with proportional prioritization, in arrays allocated once at `capacity`.
+    New transitions get the current maximum priority; when full, the oldest are overwritten.
+    States are stored as serialized keys so entries stay valid when the Q-table moves or evicts rows.
+    """
+
+    def __init__(self, capacity: int, alpha: float = 0.6, beta: float = 0.4) -> None:
+        if capacity < 1:
+            raise ValueError("Replay capacity must be at least 1")
+        self.capacity = capacity
+        self.alpha = alpha  # how strongly priorities skew sampling (0: uniform)
+        self.beta = beta  # importance-sampling correction (1: full)
+        self.states = np.empty(capacity, dtype=object)
+        self.next_states = np.empty(capacity, dtype=object)
+        self.actions = np.zeros(capacity, dtype=np.int16)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+        self.priorities = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self._next = 0  # slot the next transition is written to
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(
+        self,
+        states: Sequence[str],
+        actions: Sequence[int],
+        rewards: Sequence[float],
+        next_states: Sequence[str],
+        dones: Sequence[bool],
+    ) -> None:
+        n = len(states)
+        if n > self.capacity:  # only the newest fit
+            start = n - self.capacity
+            states, actions, rewards = states[start:], actions[start:], rewards[start:]
+            next_states, dones = next_states[start:], dones[start:]
+            n = self.capacity
+        slots = (self._next + np.arange(n)) % self.capacity
+        priority = self.priorities[: self.size].max() if self.size else 1.0
+        self.states[slots] = list(states)
+        self.next_states[slots] = list(next_states)
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.dones[slots] = dones
+        self.priorities[slots] = priority
+        self._next = int((self._next + n) % self.capacity)
+        self.size = min(self.capacity, self.size + n)
+
+    def sample(self, n: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """(slots, importance weights scaled to at most 1) for `n` transitions drawn by priority."""
+        scaled = self.priorities[: self.size] ** self.alpha
+        probs = scaled / scaled.sum()
+        slots = rng.choice(self.size, size=n, p=probs)
+        weights = (self.size * probs[slots]) ** -self.beta
+        return slots, weights / weights.max()
+
+    def update_priorities(self, slots: np.ndarray, td_errors: Sequence[float]) -> None:
+        self.priorities[slots] = np.abs(td_errors) + PRIORITY_EPS
+
+    def clear(self) -> None:
+        self.size = 0
+        self._next = 0
+
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from agents.evaluation import as_codes, markov_walk_forward, walk_forward
+
+# Ranges match the game pages' sliders so the best setting can be applied there.
+DEFAULT_GRID = {
+    "alpha": [0.05, 0.1, 0.2, 0.3, 0.5, 0.8],
+    "gamma": [0.5, 0.8, 0.9, 0.95],
+    "epsilon": [0.0, 0.05, 0.1],
+}
+
+
+class Trial(NamedTuple):
+    alpha: float
+    gamma: float
+    epsilon: float
+    order: int
+
+
+class SweepResult(NamedTuple):
+    best: Dict[str, float]
+    results: List[Dict[str, float]]  # one row per trial, best first
+
+
+def grid_trials(grid: Optional[Dict[str, Sequence[float]]] = None, orders: Sequence[int] = (1,)) -> List[Trial]:
+    grid = grid or DEFAULT_GRID
+    axes = (grid["alpha"], grid["gamma"], grid["epsilon"], orders)
+    return [Trial(a, g, e, k) for a, g, e, k in itertools.product(*axes)]
+
+
+def memory_trials(orders: Sequence[int] = (1, 2, 3, 4)) -> List[Trial]:
+    """One trial per bot memory, for the frequency predictor (it has no alpha, gamma or epsilon)."""
+    return [Trial(0.0, 0.0, 0.0, k) for k in orders]
+
+
+def random_trials(n: int, orders: Sequence[int] = (1,), seed: int = 0) -> List[Trial]:
+    rng = random.Random(seed)
+    return [
+        Trial(
+            round(rng.uniform(0.05, 1.0), 3),
+            round(rng.uniform(0.5, 0.99), 3),
+            round(rng.uniform(0.0, 0.3), 3),
+            rng.choice(list(orders)),
+        )
+        for _ in range(n)
+    ]
+
+
+# --- Worker side: the history is attached once per process from shared memory ---
+_shm: Optional[shared_memory.SharedMemory] = None
+_codes: Optional[memoryview] = None
+_n_actions = 0
+_targets: List[int] = []
+_backend = "qtable"
+
+
+def _attach(name: str, length: int, n_actions: int, targets: List[int], backend: str) -> None:
+    global _shm, _codes, _n_actions, _targets, _backend
+    _shm = shared_memory.SharedMemory(name=name)  # the parent owns and unlinks the block
+    _codes = _shm.buf[:length]
+    _n_actions, _targets, _backend = n_actions, targets, backend
+
+
+def _run_trial(trial: Trial, seed: int) -> Dict[str, float]:
+    codes = as_codes(_codes)
+    if _backend == "markov":
+        predicted = markov_walk_forward(codes, _n_actions, _targets, trial.order, seed)
+        setting: Dict[str, float] = {"order": trial.order}
+    else:
+        predicted = walk_forward(
+            codes, _n_actions, _targets, trial.alpha, trial.gamma, trial.epsilon, trial.order, seed
+        )
+        setting = trial._asdict()
+    hits = predicted == np.asarray(_targets)[codes]
+    return {**setting, "accuracy": float(hits.mean()) if len(hits) else 0.0}
+
+
+def sweep(
+    codes: Sequence[int],
+    n_actions: int,
+    targets: Sequence[int],
+    trials: List[Trial],
+    workers: Optional[int] = None,
+    seed: int = 0,
+    backend: str = "qtable",
+) -> SweepResult:
+    """
+    Score every trial by walk-forward accuracy on `codes` (action indices), spread over a process pool.
+    The history is placed in shared memory once and each worker attaches to it, instead of pickling it per task.
+    With backend "markov" the frequency predictor is scored and only each trial's order is used.
+    """
+    if not trials:
+        raise ValueError("No trials to run")
+    workers = min(workers or os.cpu_count() or 1, len(trials))
+    data = bytes(codes)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        shm.buf[: len(data)] = data
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_attach, initargs=(shm.name, len(data), n_actions, list(targets), backend)
+        ) as pool:
+            chunksize = max(1, len(trials) // (workers * 4))
+            results = list(pool.map(_run_trial, trials, [seed] * len(trials), chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+    results.sort(key=lambda r: r["accuracy"], reverse=True)
+    return SweepResult(results[0], results)
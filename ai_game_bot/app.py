@@ -1,23 +1,28 @@
 from __future__ import annotations
 
+import os
+import sys
+
 import streamlit as st
 
-from games import rps, coinflip, dice
-from utils.storage import clear_model
+from games.registry import GAMES
+from utils import metrics
+from utils.storage import MODEL_BACKENDS, MODEL_EXTENSIONS, clear_model, is_valid_namespace, model_path
+
+# Game pages (and the numpy/agent code behind them) are imported on first selection, see GameInfo.page.
+PAGES = ["Home", *(game.title for game in GAMES.values()), "Models"]
 
 
 def sidebar():
     st.sidebar.title("AI Game Bot (RL)")
-    page = st.sidebar.radio(
-        "Choose a page",
-        [
-            "Home",
-            "Rock-Paper-Scissors",
-            "Coin Flip",
-            "Dice Predictor",
-            "Models",
-        ],
-    )
+    page = st.sidebar.radio("Choose a page", PAGES)
+    profile = st.sidebar.text_input(
+        "Profile", key="profile", help="Models are kept separately per profile. Leave empty to use the shared models."
+    ).strip()
+    if profile and not is_valid_namespace(profile):
+        st.sidebar.error("Use letters, digits, '-' and '_' only.")
+        profile = ""
+    st.session_state.namespace = profile or None
     return page
 
 
@@ -26,42 +31,118 @@ def home_page():
     st.write(
         "Play a game, then train a bot on your gameplay. The bot learns a policy and suggests improvements."
     )
-    st.markdown(
-        "- Rock–Paper–Scissors: bot learns your transition patterns.\n"
-        "- Coin Flip Predictor: bot predicts your next heads/tails based on your sequence.\n"
-        "- Dice Predictor: bot predicts your next dice face from your roll history."
-    )
+    st.markdown("\n".join(f"- {game.description}" for game in GAMES.values()))
 
 
 def models_page():
     st.header("Model management")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        if st.button("Reset RPS model"):
-            clear_model("rps")
-            st.success("RPS model cleared")
-    with col2:
-        if st.button("Reset Coin Flip model"):
-            clear_model("coinflip")
-            st.success("Coin Flip model cleared")
-    with col3:
-        if st.button("Reset Dice model"):
-            clear_model("dice")
-            st.success("Dice model cleared")
+    namespace = st.session_state.get("namespace")
+    st.caption(f"Profile: {namespace or 'shared'}")
+    cache = loaded_agent_cache()
+    if cache is not None:
+        cache.flush()  # write saves still waiting for the flush timer, so the sizes include the latest training
+    for game in GAMES.values():
+        col1, col2 = st.columns([3, 1])
+        size = model_size(game.name, namespace)
+        col1.write(f"**{game.title}** — " + (f"{size / 1024:.1f} KiB on disk" if size else "not trained yet"))
+        if col2.button("Reset", key=f"reset_{game.name}"):
+            reset_model(game.name, namespace)
+            st.success(f"{game.title} model cleared")
+
+    if st.button("Compact model files"):
+        from utils.agent_cache import compact_agent  # loads the agent code (and NumPy) on demand
+
+        for game in GAMES.values():
+            for backend in MODEL_BACKENDS:
+                compact_agent(game.name, game.actions, namespace, backend)
+        st.success("Training logs merged into the model files")
+
+    if cache is None:
+        st.caption("Agent cache — no models loaded by this app process yet")
+    else:
+        stats = cache.stats()
+        st.caption(
+            f"Agent cache — {stats['entries']} loaded, {stats['hits']} hits, "
+            f"{stats['misses']} misses (disk loads), {stats['evictions']} evictions; "
+            f"{stats['saves']} saves written in {stats['flushes']} flushes"
+        )
+    metrics_panel()
+
+
+def loaded_agent_cache():
+    """
+    The process's AGENT_CACHE if a game page has loaded the agent code, else None. Home and Models don't import
+    it themselves, so visiting them doesn't load NumPy and the agents; without it nothing is cached either.
+    """
+    module = sys.modules.get("utils.agent_cache")
+    return None if module is None else module.AGENT_CACHE
+
+
+def metrics_panel():
+    with st.expander("Performance metrics"):
+        if st.button("Profile next rerun", help="Run the next page you open under cProfile and show the top calls"):
+            st.session_state.profile_next_rerun = True
+            st.info("The next rerun will be profiled.")
+        if not metrics.ENABLED:
+            st.write("Instrumentation is off. Start the app with `AI_GAME_BOT_METRICS=1` to record it.")
+            return
+        rows = metrics.snapshot()
+        if not rows:
+            st.write("Nothing recorded yet.")
+            return
+        st.dataframe(rows, hide_index=True)
+        st.download_button("Download (Prometheus text)", metrics.prometheus_text(), "ai_game_bot_metrics.prom")
+        if st.button("Reset metrics"):
+            metrics.reset()
+
+
+def model_size(game_name: str, namespace: str | None) -> int:
+    """Bytes used by the game's model files (any engine and format, including the training logs)."""
+    total = 0
+    for backend in MODEL_BACKENDS:
+        for fmt in MODEL_EXTENSIONS:
+            path = model_path(game_name, fmt, namespace, backend)
+            for file_path in (path, path + ".wal"):
+                if os.path.exists(file_path):
+                    total += os.path.getsize(file_path)
+    return total
+
+
+def reset_model(game_name: str, namespace: str | None) -> None:
+    cache = loaded_agent_cache()
+    if cache is not None:
+        # drop unsaved changes first so a pending flush can't bring the model back
+        cache.invalidate(game_name, namespace)
+    clear_model(game_name, namespace)
+    # the page's "already trained" positions, keyed (engine, profile, memory), refer to the cleared models:
+    # forget them so the next Train learns the whole session again
+    trained_upto = st.session_state.get(GAMES[game_name].session_key("trained_upto"), {})
+    for key in [key for key in trained_upto if key[1] == namespace]:
+        del trained_upto[key]
 
 
 PAGE_MAP = {
-    "Home": home_page,
-    "Rock-Paper-Scissors": rps.run,
-    "Coin Flip": coinflip.run,
-    "Dice Predictor": dice.run,
-    "Models": models_page,
+    "Home": ("home", home_page),
+    "Models": ("models", models_page),
 }
 
 
 def main():
     page = sidebar()
-    PAGE_MAP[page]()
+    if page in PAGE_MAP:
+        name, render = PAGE_MAP[page]
+    else:
+        game = next(game for game in GAMES.values() if game.title == page)
+        name, render = game.name, game.page()
+    if st.session_state.pop("profile_next_rerun", False):
+        path, report = metrics.profile(render, name)
+        with st.expander(f"Profile of this rerun (saved to {path})"):
+            st.code(report)
+    else:
+        with metrics.timer(f"page.{name}"):
+            render()
+    if metrics.ENABLED and metrics.METRICS_FILE:
+        metrics.write_prometheus(metrics.METRICS_FILE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+"""
+Walk-forward evaluation of the bot on a recorded or synthetic history: predict each move from the ones
+before it, score it, then learn it, as if the bot had been trained after every round.
+
+    python -m bench.evaluate --game rps --history my_moves.txt --order 2
+    python -m bench.evaluate --game dice --player markov1 --rounds 1000000
+
+A history file is read like the pages' imports (utils.move_io): CSV with one move per line, comma-separated
+moves or a `move` column, or JSON lines (.jsonl), e.g. a file exported from a game page. Reports accuracy,
+the win/draw/loss rates for Rock-Paper-Scissors, rounds evaluated per second and the learning curve.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from agents.backends import BACKENDS
+from agents.evaluation import evaluate, score_matrix
+from bench.players import PLAYERS
+from bench.simulate import GAMES
+from utils.move_io import read_moves
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=sorted(GAMES), default="rps")
+    parser.add_argument("--history", help="file of recorded moves (default: synthetic player)")
+    parser.add_argument("--player", choices=sorted(PLAYERS), default="markov1")
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument("--alpha", type=float, default=0.3)
+    parser.add_argument("--gamma", type=float, default=0.95)
+    parser.add_argument("--epsilon", type=float, default=0.0)
+    parser.add_argument("--order", type=int, default=1, help="history length used as the bot's state")
+    parser.add_argument("--points", type=int, default=10, help="learning curve blocks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="qtable", help="bot engine to replay")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    spec = GAMES[args.game]
+    if args.history:
+        index = {a: i for i, a in enumerate(spec.actions)}
+        codes = np.fromiter((index[m] for m in read_moves(args.history, spec.actions)), dtype=np.uint8)
+    else:
+        codes = PLAYERS[args.player](args.rounds, len(spec.actions), np.random.default_rng(args.seed))
+    targets = [spec.actions.index(spec.bot_target(a)) for a in spec.actions]
+    scores = score_matrix(spec.actions, spec.score) if args.game == "rps" else None
+
+    start = time.perf_counter()
+    settings = (args.alpha, args.gamma, args.epsilon, args.order, args.seed)
+    result = evaluate(codes, len(spec.actions), targets, scores, *settings, points=args.points, backend=args.backend)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps({**result._asdict(), "seconds": elapsed}, indent=2))
+        return
+    print(f"{args.game}: {result.rounds:,} rounds in {elapsed:.2f} s ({result.rounds / elapsed:,.0f} rounds/s)")
+    print(f"accuracy  {result.accuracy:.3f}")
+    if result.outcomes is not None:
+        print(f"win {result.outcomes[1]:.3f}  draw {result.outcomes[0]:.3f}  loss {result.outcomes[-1]:.3f}")
+    print("learning curve (accuracy per block):")
+    for rounds, accuracy in result.curve:
+        print(f"  {rounds:>10,}  {accuracy:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Import-time benchmark for the app's cold start, using `python -X importtime` in fresh interpreters.
+
+    python -m bench.import_time --repeat 5
+
+Compares importing the app shell (what every process start and Home/Models visit pays) with importing it
+plus every game page (what the shell cost when all pages were imported eagerly), and lists the slowest
+top-level imports of the eager case.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "lazy (app shell)": "import app",
+    "eager (shell + all game pages)": (
+        "import app\nfrom games.registry import GAMES\nfor game in GAMES.values(): game.page()"
+    ),
+}
+
+
+def import_profile(code: str) -> Dict[str, Tuple[int, int]]:
+    """module -> (self us, cumulative us) from one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    profile = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # nesting shows as indentation of the name; keep it to tell top-level imports apart
+        profile[name.rstrip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def total_ms(profile: Dict[str, Tuple[int, int]]) -> float:
+    return sum(self_us for self_us, _ in profile.values()) / 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per scenario (median is shown)")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    profiles: Dict[str, List[Dict[str, Tuple[int, int]]]] = {}
+    for name, code in SCENARIOS.items():
+        profiles[name] = [import_profile(code) for _ in range(args.repeat)]
+
+    print(f"{'scenario':<34}{'import ms':>10}{'modules':>9}")
+    for name, runs in profiles.items():
+        ms = statistics.median(total_ms(p) for p in runs)
+        print(f"{name:<34}{ms:>10.1f}{len(runs[0]):>9}")
+
+    lazy, eager = (profiles[name][0] for name in SCENARIOS)
+    deferred = [m for m in eager if m not in lazy]
+    print(f"\n{len(deferred)} modules are only imported once a game page is opened, slowest (cumulative ms):")
+    top = sorted(((eager[m][1], m) for m in deferred if not m.startswith("  ")), reverse=True)[: args.top]
+    for cumulative_us, module in top:
+        print(f"  {cumulative_us / 1000:>8.1f}  {module.strip()}")
+
+
+if __name__ == "__main__":
+    main()
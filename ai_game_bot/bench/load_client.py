@@ -0,0 +1,139 @@
+"""
+Load generator for the prediction server (server.py): many concurrent clients sending predict requests.
+
+    python -m bench.load_client --spawn --connections 64 --requests 20000
+    python -m bench.load_client --port 8765 --game dice --order 2
+
+Each connection keeps `--in-flight` requests outstanding and sends the next one as soon as a response
+arrives. Reports requests/sec and p50/p99 latency, plus the server's batching stats.
+With `--spawn` a server is started on a free port for the run (its models come from MODELS_DIR as usual).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from games.registry import GAMES
+
+
+class Client:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader, self.writer = reader, writer
+        self._next_id = 0
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+
+    async def request(self, payload: Dict) -> Dict:
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[self._next_id] = future
+        self.writer.write(json.dumps({"id": self._next_id, **payload}).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self) -> None:
+        self._listener.cancel()
+        self.writer.close()
+
+
+async def connect(host: str, port: int, unix: Optional[str]) -> Client:
+    if unix:
+        reader, writer = await asyncio.open_unix_connection(unix)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    return Client(reader, writer)
+
+
+async def run_load(args: argparse.Namespace, host: str, port: int) -> Tuple[List[float], float, Dict, int]:
+    actions = GAMES[args.game].actions
+    clients = [await connect(host, port, args.unix) for _ in range(args.connections)]
+    latencies: List[float] = []
+    errors = 0
+    remaining = args.requests
+    rng = random.Random(args.seed)
+
+    async def worker(client: Client) -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            history = [rng.choice(actions) for _ in range(args.order)]
+            start = time.perf_counter()
+            response = await client.request(
+                {"op": "predict", "game": args.game, "history": history, "order": args.order}
+            )
+            latencies.append(time.perf_counter() - start)
+            errors += not response.get("ok")
+
+    await clients[0].request({"op": "ping"})
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(c) for c in clients for _ in range(args.in_flight)))
+    elapsed = time.perf_counter() - start
+    stats = (await clients[0].request({"op": "stats"}))["stats"]
+    for client in clients:
+        await client.close()
+    return latencies, elapsed, stats, errors
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--spawn", action="store_true", help="start a server on a free port for this run")
+    parser.add_argument("--game", choices=sorted(GAMES), default="rps")
+    parser.add_argument("--order", type=int, default=1)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--in-flight", type=int, default=1, help="outstanding requests per connection")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    host, port = args.host, args.port
+    if args.spawn:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "server", "--host", host, "--port", "0"], stdout=subprocess.PIPE, text=True
+        )
+        banner = server.stdout.readline().strip()  # "listening on host:port"
+        port = int(banner.rsplit(":", 1)[1])
+        args.unix = None
+    try:
+        latencies, elapsed, stats, errors = asyncio.run(run_load(args, host, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print(
+        f"{len(latencies)} predicts ({args.game}, order {args.order}) over {args.connections} connections "
+        f"x {args.in_flight} in flight"
+    )
+    print(f"throughput  {len(latencies) / elapsed:,.0f} req/s")
+    p50, p99 = percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000
+    print(f"latency     p50 {p50:.2f} ms   p99 {p99:.2f} ms")
+    print(f"batches     {stats['batches']} (mean size {stats['mean_batch']:.1f}), errors {errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Round-trip, size and latency comparison of the JSON and binary (.qtb) model formats.
+
+    python -m bench.model_format --states 300000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from agents.q_learning import QLearningAgent
+from agents.q_table import DenseQTable
+
+
+def build_agent(n_states: int, actions: list, seed: int) -> QLearningAgent:
+    rng = np.random.default_rng(seed)
+    agent = QLearningAgent(actions=actions)
+    table = DenseQTable(actions, capacity=n_states)
+    for i in range(n_states):
+        table.row_id(f'["s", {i}]')
+    table.values[:n_states] = rng.random((n_states, len(actions)))
+    agent._q = table
+    return agent
+
+
+def bench_format(agent: QLearningAgent, path: str, probes: list) -> dict:
+    start = time.perf_counter()
+    agent.save(path)
+    save_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = QLearningAgent.load(path, actions=agent.actions)
+    open_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in probes:
+        loaded.best_action_value(key)
+    first_lookups_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in probes:
+        loaded.best_action_value(key)
+    warm_lookups_s = time.perf_counter() - start
+
+    return {
+        "loaded": loaded,
+        "size_bytes": os.path.getsize(path),
+        "save_s": save_s,
+        "open_s": open_s,
+        "first_lookups_s": first_lookups_s,
+        "warm_lookups_s": warm_lookups_s,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--states", type=int, default=300_000)
+    parser.add_argument("--probes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    actions = ["rock", "paper", "scissors"]
+    agent = build_agent(args.states, actions, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    probes = [["s", int(i)] for i in rng.integers(0, args.states, size=args.probes)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, ext in (("json", ".json"), ("binary", ".qtb")):
+            res = bench_format(agent, os.path.join(tmp, f"bench_qtable{ext}"), probes)
+            loaded = res.pop("loaded")
+            assert loaded.to_json() == agent.to_json(), f"{name} round trip changed the table"
+            results[name] = res
+
+    print(f"{args.states} states x {len(actions)} actions, {args.probes} random lookups (round trip OK)")
+    print(f"{'format':<8}{'size MB':>10}{'save s':>10}{'open s':>10}{'1st look s':>12}{'warm s':>10}")
+    for name, res in results.items():
+        print(
+            f"{name:<8}{res['size_bytes'] / 1e6:>10.2f}{res['save_s']:>10.3f}{res['open_s']:>10.4f}"
+            f"{res['first_lookups_s']:>12.4f}{res['warm_lookups_s']:>10.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
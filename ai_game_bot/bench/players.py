@@ -0,0 +1,59 @@
+"""
+Synthetic players for headless runs. Each generator returns `n` moves as action indices (int8 array).
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import Callable, Dict
+
+import numpy as np
+
+Player = Callable[[int, int, np.random.Generator], np.ndarray]
+
+
+def iid_player(n: int, n_actions: int, rng: np.random.Generator) -> np.ndarray:
+    """Uniformly random moves: nothing to learn, accuracy should sit at 1/|actions|."""
+    return rng.integers(0, n_actions, size=n, dtype=np.int8)
+
+
+def biased_player(n: int, n_actions: int, rng: np.random.Generator, favourite_p: float = 0.6) -> np.ndarray:
+    """Plays one favourite move with probability `favourite_p`, the rest uniformly."""
+    probs = np.full(n_actions, (1 - favourite_p) / (n_actions - 1))
+    probs[rng.integers(n_actions)] = favourite_p
+    return rng.choice(n_actions, size=n, p=probs).astype(np.int8)
+
+
+def markov_player(n: int, n_actions: int, rng: np.random.Generator, order: int = 1) -> np.ndarray:
+    """Order-k Markov player with a random, fairly peaked transition table over the last k moves."""
+    n_contexts = n_actions**order
+    table = rng.dirichlet(np.full(n_actions, 0.3), size=n_contexts)
+    cumulative = np.cumsum(table, axis=1).tolist()
+    moves = []
+    context = 0
+    last = n_actions - 1
+    for draw in rng.random(n).tolist():
+        move = min(bisect_right(cumulative[context], draw), last)
+        moves.append(move)
+        context = (context * n_actions + move) % n_contexts
+    return np.array(moves, dtype=np.int8)
+
+
+def pattern_switching_player(
+    n: int, n_actions: int, rng: np.random.Generator, pattern_len: int = 4, switch_every: int = 500
+) -> np.ndarray:
+    """Repeats a short fixed pattern, switching to a new random pattern every `switch_every` moves."""
+    moves = np.empty(n, dtype=np.int8)
+    for start in range(0, n, switch_every):
+        pattern = rng.integers(0, n_actions, size=pattern_len, dtype=np.int8)
+        block = min(switch_every, n - start)
+        moves[start : start + block] = np.resize(pattern, block)
+    return moves
+
+
+PLAYERS: Dict[str, Player] = {
+    "iid": iid_player,
+    "biased": biased_player,
+    "markov1": lambda n, k, rng: markov_player(n, k, rng, order=1),
+    "markov2": lambda n, k, rng: markov_player(n, k, rng, order=2),
+    "switching": pattern_switching_player,
+}
@@ -0,0 +1,146 @@
+"""
+Bot engines compared on next-move prediction: the Q-table (QLearningAgent) against the frequency/Markov
+predictor (MarkovAgent), by held-out accuracy against updates spent and by update/prediction speed.
+
+    python -m bench.predictors --game coinflip --player markov2 --order 3
+    python -m bench.predictors --game dice --player switching --rounds 5000 --chunk 100
+
+Rounds arrive in chunks, as when the Train button is pressed every `--chunk` moves; after each chunk both
+engines predict the same held-out continuation of the player. Speed is measured on `--speed-rounds` moves:
+update_batch as the Train button calls it, update one round at a time as a loop would, and choose_actions.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, Dict, List, Tuple, Type
+
+import numpy as np
+
+from agents.backends import BACKENDS
+from agents.base import BotAgent
+from agents.history_state import HistoryEncoder
+from bench.players import PLAYERS
+from bench.sample_efficiency import updates_to_reach
+from bench.simulate import GAMES
+
+Curve = List[Tuple[int, float]]  # (rounds trained so far, accuracy); each round is one update
+
+
+def make_agent(
+    cls: Type[BotAgent], game: str, order: int, seed: int, alpha: float, gamma: float
+) -> Tuple[HistoryEncoder, BotAgent]:
+    encoder = HistoryEncoder(GAMES[game].actions, order)
+    agent = cls(GAMES[game].actions, alpha=alpha, gamma=gamma, state_serializer=encoder.serialize, seed=seed)
+    return encoder, agent
+
+
+def run_curve(
+    cls: Type[BotAgent],
+    moves: List[str],
+    test: List[str],
+    game: str,
+    order: int,
+    chunk: int,
+    seed: int,
+    alpha: float,
+    gamma: float,
+) -> Curve:
+    spec = GAMES[game]
+    encoder, agent = make_agent(cls, game, order, seed, alpha, gamma)
+    test_states, _ = encoder.transitions(test, before=moves[-order:])
+    wanted = [spec.bot_target(m) for m in test]
+    curve: Curve = []
+    for start in range(0, len(moves), chunk):
+        new = moves[start : start + chunk]
+        states, next_states = encoder.transitions(new, before=moves[max(0, start - order) : start])
+        agent.update_batch(states, [spec.bot_target(m) for m in new], 1.0, next_states, False)
+        agent.rng = np.random.default_rng(seed)  # same tie-breaking draws at every checkpoint
+        predicted = agent.choose_actions(test_states, training=False)
+        curve.append((start + len(new), sum(p == w for p, w in zip(predicted, wanted)) / len(wanted)))
+    return curve
+
+
+def rate(run: Callable[[], None], rounds: int) -> float:
+    start = time.perf_counter()
+    run()
+    return rounds / (time.perf_counter() - start)
+
+
+def speeds(
+    cls: Type[BotAgent], moves: List[str], game: str, order: int, alpha: float, gamma: float
+) -> Tuple[float, float, float]:
+    """Rounds per second for (update_batch, update in a loop, choose_actions)."""
+    spec = GAMES[game]
+    encoder, agent = make_agent(cls, game, order, 0, alpha, gamma)
+    states, next_states = encoder.transitions(moves)
+    targets = [spec.bot_target(m) for m in moves]
+    batch = rate(lambda: agent.update_batch(states, targets, 1.0, next_states, False), len(moves))
+    loop_rounds = min(len(moves), 20_000)
+
+    def loop() -> None:
+        for i in range(loop_rounds):
+            agent.update(states[i], targets[i], 1.0, next_states[i], False)
+
+    single = rate(loop, loop_rounds)
+    predict = rate(lambda: agent.choose_actions(states, training=False), len(moves))
+    return batch, single, predict
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=sorted(GAMES), default="coinflip")
+    parser.add_argument("--player", choices=sorted(PLAYERS), default="markov2")
+    parser.add_argument("--rounds", type=int, default=2000, help="training rounds")
+    parser.add_argument("--test", type=int, default=5000, help="held-out rounds predicted at each checkpoint")
+    parser.add_argument("--chunk", type=int, default=50, help="rounds per training call")
+    parser.add_argument("--order", type=int, default=2, help="bot memory (last N moves)")
+    parser.add_argument("--alpha", type=float, default=0.3)
+    parser.add_argument("--gamma", type=float, default=0.95)
+    parser.add_argument("--seeds", type=int, default=5, help="players/agents averaged over")
+    parser.add_argument("--speed-rounds", type=int, default=200_000)
+    args = parser.parse_args()
+
+    spec = GAMES[args.game]
+    curves: Dict[str, List[Curve]] = {name: [] for name in BACKENDS}
+    for seed in range(args.seeds):
+        codes = PLAYERS[args.player](args.rounds + args.test, len(spec.actions), np.random.default_rng(seed))
+        played = [spec.actions[c] for c in codes.tolist()]
+        moves, test = played[: args.rounds], played[args.rounds :]
+        for name, cls in BACKENDS.items():
+            curves[name].append(
+                run_curve(cls, moves, test, args.game, args.order, args.chunk, seed, args.alpha, args.gamma)
+            )
+
+    # average over seeds; checkpoints line up because every seed sees the same chunks
+    mean = {
+        name: [(points[0][0], float(np.mean([a for _, a in points]))) for points in zip(*runs)]
+        for name, runs in curves.items()
+    }
+    print(
+        f"{args.game} vs {args.player}, memory {args.order}, {args.rounds} rounds in chunks of {args.chunk}, "
+        f"{args.seeds} seeds: held-out accuracy by rounds trained (one update per round)"
+    )
+    n_points = len(next(iter(mean.values())))
+    checkpoints = sorted({min(n_points, k) - 1 for k in (1, 2, 4, 8, 16, 32, 64, 10**9)})
+    print(f"{'rounds':>8}" + "".join(f"{name:>10}" for name in mean))
+    for i in checkpoints:
+        print(f"{mean['qtable'][i][0]:>8}" + "".join(f"{c[i][1]:>10.3f}" for c in mean.values()))
+    print(f"{'mean':>8}" + "".join(f"{np.mean([a for _, a in c]):>10.3f}" for c in mean.values()))
+    goal = 0.95 * max(acc for _, acc in mean["qtable"])
+    print(
+        f"rounds to reach {goal:.3f} (95% of the Q-table's best): "
+        + ", ".join(f"{name} {updates_to_reach(c, goal)}" for name, c in mean.items())
+    )
+
+    codes = PLAYERS[args.player](args.speed_rounds, len(spec.actions), np.random.default_rng(0))
+    moves = [spec.actions[c] for c in codes.tolist()]
+    print(f"\nspeed on {args.speed_rounds:,} rounds (rounds/s):")
+    print(f"{'engine':>8}{'update_batch':>16}{'update':>12}{'predict':>14}")
+    for name, cls in BACKENDS.items():
+        batch, single, predict = speeds(cls, moves, args.game, args.order, args.alpha, args.gamma)
+        print(f"{name:>8}{batch:>16,.0f}{single:>12,.0f}{predict:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
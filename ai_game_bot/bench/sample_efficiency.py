@@ -0,0 +1,133 @@
+"""
+Sample efficiency of the learning rules: held-out accuracy against the number of Q updates spent, for
+one-step Q-learning, Watkins Q(lambda) traces, prioritized replay and both together.
+
+    python -m bench.sample_efficiency --game rps --player markov1 --rounds 2000 --chunk 50
+    python -m bench.sample_efficiency --game dice --player switching --order 2 --lam 0.9 --replay-ratio 2
+
+Rounds arrive in chunks, as when the Train button is pressed every `--chunk` moves. After each chunk
+every learner predicts the same held-out continuation of the player greedily. An update is one
+transition applied by `update_batch` (per epoch) or one replayed transition.
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from agents.history_state import HistoryEncoder
+from agents.q_learning import QLearningAgent
+from bench.players import PLAYERS
+from bench.simulate import GAMES
+
+Curve = List[Tuple[int, float]]  # (updates so far, accuracy)
+
+
+def learners(lam: float, replay_size: int, replay_ratio: float) -> Dict[str, Tuple[float, int, float]]:
+    """name -> (trace_decay, replay capacity, replay ratio)"""
+    return {
+        "one-step": (0.0, replay_size, 0.0),
+        f"q-lambda {lam:g}": (lam, replay_size, 0.0),
+        f"replay x{replay_ratio:g}": (0.0, replay_size, replay_ratio),
+        "q-lambda + replay": (lam, replay_size, replay_ratio),
+    }
+
+
+def run_curve(
+    moves: List[str],
+    test: List[str],
+    game: str,
+    order: int,
+    chunk: int,
+    epochs: int,
+    trace_decay: float,
+    replay_size: int,
+    replay_ratio: float,
+    seed: int,
+    alpha: float,
+    gamma: float,
+) -> Curve:
+    spec = GAMES[game]
+    encoder = HistoryEncoder(spec.actions, order)
+    agent = QLearningAgent(
+        spec.actions, alpha=alpha, gamma=gamma, state_serializer=encoder.serialize, seed=seed, trace_decay=trace_decay
+    )
+    agent.set_replay(replay_ratio, replay_size)
+    test_states, _ = encoder.transitions(test, before=moves[-order:])
+    wanted = [spec.bot_target(m) for m in test]
+    curve: Curve = []
+    updates = 0
+    for start in range(0, len(moves), chunk):
+        new = moves[start : start + chunk]
+        states, next_states = encoder.transitions(new, before=moves[max(0, start - order) : start])
+        replayed = agent.replayed
+        agent.update_batch(states, [spec.bot_target(m) for m in new], 1.0, next_states, False, epochs=epochs)
+        updates += len(new) * epochs + agent.replayed - replayed
+        agent.rng = np.random.default_rng(seed)  # same tie-breaking draws at every checkpoint
+        predicted = agent.choose_actions(test_states, training=False)
+        curve.append((updates, sum(p == w for p, w in zip(predicted, wanted)) / len(wanted)))
+    return curve
+
+
+def updates_to_reach(curve: Curve, accuracy: float) -> int:
+    for updates, acc in curve:
+        if acc >= accuracy:
+            return updates
+    return -1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=sorted(GAMES), default="rps")
+    parser.add_argument("--player", choices=sorted(PLAYERS), default="markov1")
+    parser.add_argument("--rounds", type=int, default=2000, help="training rounds")
+    parser.add_argument("--test", type=int, default=5000, help="held-out rounds predicted at each checkpoint")
+    parser.add_argument("--chunk", type=int, default=50, help="rounds per training call")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--order", type=int, default=1)
+    parser.add_argument("--alpha", type=float, default=0.3)
+    parser.add_argument("--gamma", type=float, default=0.95)
+    parser.add_argument("--lam", type=float, default=0.8, help="trace decay (lambda)")
+    parser.add_argument("--replay-size", type=int, default=2000)
+    parser.add_argument("--replay-ratio", type=float, default=1.0, help="replayed transitions per new one")
+    parser.add_argument("--seeds", type=int, default=5, help="players/agents averaged over")
+    args = parser.parse_args()
+
+    spec = GAMES[args.game]
+    names = learners(args.lam, args.replay_size, args.replay_ratio)
+    curves: Dict[str, List[Curve]] = {name: [] for name in names}
+    for seed in range(args.seeds):
+        codes = PLAYERS[args.player](args.rounds + args.test, len(spec.actions), np.random.default_rng(seed))
+        played = [spec.actions[c] for c in codes.tolist()]
+        moves, test = played[: args.rounds], played[args.rounds :]
+        for name, (lam, size, ratio) in names.items():
+            curve = run_curve(
+                moves, test, args.game, args.order, args.chunk, args.epochs,
+                lam, size, ratio, seed, args.alpha, args.gamma,
+            )
+            curves[name].append(curve)
+
+    # average over seeds; checkpoints line up because every seed sees the same chunks
+    mean = {
+        name: [(int(np.mean([u for u, _ in points])), float(np.mean([a for _, a in points]))) for points in zip(*runs)]
+        for name, runs in curves.items()
+    }
+    print(
+        f"{args.game} vs {args.player}, order {args.order}, {args.rounds} rounds in chunks of {args.chunk}, "
+        f"{args.seeds} seeds: held-out accuracy by rounds trained (updates spent)"
+    )
+    checkpoints = sorted({max(0, min(len(mean["one-step"]), k) - 1) for k in (1, 2, 4, 8, 16, 32, 64, 10**9)})
+    print(f"{'rounds':>8}" + "".join(f"{name:>24}" for name in mean))
+    for i in checkpoints:
+        rounds = min(args.rounds, (i + 1) * args.chunk)
+        print(f"{rounds:>8}" + "".join(f"{c[i][1]:>15.3f} ({c[i][0]:>6})" for c in mean.values()))
+    goal = 0.95 * max(acc for _, acc in mean["one-step"])
+    print(
+        f"updates to reach {goal:.3f} (95% of one-step's best): "
+        + ", ".join(f"{name} {updates_to_reach(c, goal)}" for name, c in mean.items())
+    )
+
+
+if __name__ == "__main__":
+    main()
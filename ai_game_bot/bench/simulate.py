@@ -0,0 +1,174 @@
+"""
+Headless simulation: train and evaluate the game bots against synthetic players, without Streamlit.
+
+    python -m bench.simulate --rounds 1000000 --out sim_results.json
+
+For each game and player the first `--train-frac` of the rounds trains a fresh QLearningAgent (the same
+transitions the game pages use), the rest is predicted move by move. Results are written as JSON.
+Each game and player runs in a fresh process, so its peak RSS is its own and not the largest run so far.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from agents.history_state import HistoryEncoder
+from agents.q_learning import QLearningAgent
+from bench.players import PLAYERS
+from games.registry import GAMES as GAME_INFO
+from games.registry import GameInfo
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class GameSpec:
+    def __init__(self, actions: List[str], bot_target: Callable[[str], str], score: Callable[[str, str], int]):
+        self.actions = actions
+        self.bot_target = bot_target  # the bot action that is right against a human move
+        self.score = score  # (bot move, human move) -> 1 / 0 / -1
+
+
+def game_spec(game: GameInfo) -> GameSpec:
+    """
+    A game from the registry, without importing its page. Games with targets are played against the human
+    (e.g. Rock-Paper-Scissors: the same move is a draw, any other a loss); the others are guessing games.
+    """
+
+    def score(bot: str, human: str) -> int:
+        if bot == game.target(human):
+            return 1
+        return 0 if game.targets and bot == human else -1
+
+    return GameSpec(game.actions, game.target, score)
+
+
+GAMES: Dict[str, GameSpec] = {name: game_spec(game) for name, game in GAME_INFO.items()}
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_one(
+    game: str,
+    player: str,
+    rounds: int,
+    train_frac: float,
+    epochs: int,
+    seed: int,
+    alpha: float = 0.3,
+    gamma: float = 0.95,
+    order: int = 1,
+) -> Dict[str, object]:
+    spec = GAMES[game]
+    rng = np.random.default_rng(seed)
+    codes = PLAYERS[player](rounds, len(spec.actions), rng)
+    moves = [spec.actions[c] for c in codes.tolist()]
+    split = max(1, int(rounds * train_frac))
+    train, test = moves[:split], moves[split:]
+
+    encoder = HistoryEncoder(spec.actions, order)
+    agent = QLearningAgent(
+        actions=spec.actions, alpha=alpha, gamma=gamma, state_serializer=encoder.serialize, seed=seed
+    )
+    start = time.perf_counter()
+    states, next_states = encoder.transitions(train)
+    agent.update_batch(states, [spec.bot_target(m) for m in train], 1.0, next_states, False, epochs=epochs)
+    train_s = time.perf_counter() - start
+
+    # The player's moves don't depend on the bot's, so every test state is known up front: predict in one batch.
+    scores = {1: 0, 0: 0, -1: 0}
+    start = time.perf_counter()
+    test_states, _ = encoder.transitions(test, before=train[-order:])
+    for bot, move in zip(agent.choose_actions(test_states, training=False), test):
+        scores[spec.score(bot, move)] += 1
+    predict_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sizes = {}
+        for ext in (".json", ".qtb"):
+            path = os.path.join(tmp, f"{game}_qtable{ext}")
+            agent.save(path)
+            sizes[ext.lstrip(".")] = os.path.getsize(path)
+
+    n_test = max(1, len(test))
+    result: Dict[str, object] = {
+        "game": game,
+        "player": player,
+        "train_rounds": len(train),
+        "test_rounds": len(test),
+        "epochs": epochs,
+        "order": order,
+        "states": len(agent._q),
+        "updates_per_s": len(train) * epochs / train_s if train_s else None,
+        "predictions_per_s": len(test) / predict_s if predict_s else None,
+        "accuracy": scores[1] / n_test,
+        "model_bytes": sizes,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if game == "rps":
+        result.update(win_rate=scores[1] / n_test, draw_rate=scores[0] / n_test, loss_rate=scores[-1] / n_test)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", nargs="+", choices=sorted(GAMES), default=sorted(GAMES))
+    parser.add_argument("--players", nargs="+", choices=sorted(PLAYERS), default=sorted(PLAYERS))
+    parser.add_argument("--rounds", type=int, default=200_000)
+    parser.add_argument("--train-frac", type=float, default=0.8)
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--alpha", type=float, default=0.3)
+    parser.add_argument("--gamma", type=float, default=0.95)
+    parser.add_argument("--order", type=int, default=1, help="history length used as the bot's state")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    runs = []
+    for game in args.games:
+        for i, player in enumerate(args.players):
+            settings = (args.rounds, args.train_frac, args.epochs, args.seed + i, args.alpha, args.gamma, args.order)
+            # one fresh process per run: ru_maxrss is a process-wide high-water mark
+            with mp.get_context("spawn").Pool(1) as pool:
+                res = pool.apply(run_one, (game, player, *settings))
+            runs.append(res)
+            print(
+                f"{game:<9}{player:<10} acc {res['accuracy']:.3f}  "
+                f"{res['updates_per_s']:>12,.0f} upd/s  {res['predictions_per_s']:>10,.0f} pred/s",
+                file=sys.stderr,
+            )
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "args": vars(args),
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Stress test for the model store: several processes save and load the same model concurrently.
+
+    python -m bench.store_stress --writers 4 --readers 2 --iterations 200
+
+Writer w owns the states "w<w>-k<k>" and on iteration i sets every action of all of them to i. It also sets
+action w of the states "shared-k<k>", which every writer trains, to i. Then it saves through its own
+AgentCache (coalesced writes, exclusive lock). Readers load the model under a shared lock and check that it
+parses and that each writer's own rows are all equal, i.e. no save was ever seen half-written. At the end the
+model is compacted and every writer's rows, and its action of the shared rows, must hold its last iteration:
+training on a row that another process trained at the same time must not be lost either.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import tempfile
+import time
+from typing import Dict, List
+
+from agents.q_learning import QLearningAgent
+from utils import storage
+from utils.agent_cache import AgentCache
+
+GAME = "stress"
+SHARED = "shared"
+
+
+def _actions(writers: int) -> List[str]:
+    return [f"a{w}" for w in range(writers)]  # one action per writer for the shared states
+
+
+def _writer(
+    models_dir: str, w: int, writers: int, iterations: int, keys: int, flush_interval: float, out: "mp.Queue"
+) -> None:
+    storage.MODELS_DIR = models_dir
+    actions = _actions(writers)
+    cache = AgentCache(flush_interval=flush_interval)
+    states = [f"w{w}-k{k}" for k in range(keys)]
+    shared = [f"{SHARED}-k{k}" for k in range(keys)]
+    start = time.perf_counter()
+    for i in range(iterations):
+        agent = cache.get(GAME, actions)
+        agent.alpha, agent.gamma = 1.0, 0.0
+        for state in states:
+            for action in actions:
+                agent.update(state, action, float(i), state, True)
+        for state in shared:
+            agent.update(state, actions[w], float(i), state, True)
+        cache.save(GAME, agent)
+    cache.flush()
+    out.put({"role": "writer", "seconds": time.perf_counter() - start, **cache.stats()})
+
+
+def _check(agent: QLearningAgent) -> List[str]:
+    errors = []
+    by_writer: Dict[str, set] = {}
+    for state, values in agent._q.to_dict().items():
+        if state.strip('"').startswith(SHARED):  # keys are JSON-serialized states
+            continue  # each writer sets its own action of these
+        if len(set(values.values())) != 1:
+            errors.append(f"{state}: actions disagree {values}")
+        by_writer.setdefault(state.split("-")[0], set()).update(values.values())
+    for writer, seen in by_writer.items():
+        if len(seen) != 1:
+            errors.append(f"{writer}: rows from different saves {sorted(seen)}")
+    return errors
+
+
+def _reader(models_dir: str, writers: int, stop: "mp.Event", out: "mp.Queue") -> None:
+    storage.MODELS_DIR = models_dir
+    path = storage.model_path(GAME)
+    loads, errors = 0, []
+    start = time.perf_counter()
+    while not stop.is_set():
+        try:
+            with storage.model_lock(path, shared=True):
+                agent = QLearningAgent.load(path, actions=_actions(writers))
+            errors.extend(_check(agent))
+        except Exception as exc:  # a torn file would surface as a parse error
+            errors.append(repr(exc))
+        loads += 1
+    out.put({"role": "reader", "seconds": time.perf_counter() - start, "loads": loads, "errors": errors[:10]})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--keys", type=int, default=50, help="states per writer")
+    parser.add_argument("--flush-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as models_dir:
+        storage.MODELS_DIR = models_dir
+        out: "mp.Queue" = mp.Queue()
+        stop = mp.Event()
+        writers = [
+            mp.Process(
+                target=_writer,
+                args=(models_dir, w, args.writers, args.iterations, args.keys, args.flush_interval, out),
+            )
+            for w in range(args.writers)
+        ]
+        readers = [mp.Process(target=_reader, args=(models_dir, args.writers, stop, out)) for _ in range(args.readers)]
+        for p in readers + writers:
+            p.start()
+        results = [out.get() for _ in writers]
+        stop.set()
+        results += [out.get() for _ in readers]
+        for p in readers + writers:
+            p.join()
+
+        actions = _actions(args.writers)
+        cache = AgentCache(flush_interval=0)
+        cache.compact(GAME, actions)
+        final = QLearningAgent.load(storage.model_path(GAME), actions=actions)
+        expected = float(args.iterations - 1)
+        lost = [
+            f"w{w}-k{k}"
+            for w in range(args.writers)
+            for k in range(args.keys)
+            if final.get_q_values(f"w{w}-k{k}") != dict.fromkeys(actions, expected)
+        ]
+        lost += [
+            f"{SHARED}-k{k}[a{w}] = {final.get_q_values(f'{SHARED}-k{k}')[f'a{w}']}"
+            for k in range(args.keys)
+            for w in range(args.writers)
+            if final.get_q_values(f"{SHARED}-k{k}")[f"a{w}"] != expected
+        ]
+
+    writer_stats = [r for r in results if r["role"] == "writer"]
+    reader_stats = [r for r in results if r["role"] == "reader"]
+    saves = sum(r["saves"] for r in writer_stats)
+    flushes = sum(r["flushes"] for r in writer_stats)
+    write_s = max(r["seconds"] for r in writer_stats)
+    loads = sum(r["loads"] for r in reader_stats)
+    read_s = max((r["seconds"] for r in reader_stats), default=1.0)
+    errors = [e for r in reader_stats for e in r["errors"]]
+    print(f"{args.writers} writers x {args.iterations} saves, {args.readers} readers, {args.keys} states per writer")
+    print(f"saves     {saves:>8} ({saves / write_s:,.0f}/s), written in {flushes} flushes")
+    print(f"loads     {loads:>8} ({loads / read_s:,.0f}/s)")
+    print(f"errors    {len(errors):>8}" + "".join(f"\n  {e}" for e in errors[:10]))
+    print(f"lost rows {len(lost):>8}" + (f" e.g. {lost[:5]}" if lost else ""))
+    if errors or lost:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Hyperparameter sweep over a recorded or synthetic history, with process-pool scaling.
+
+    python -m bench.sweep --game rps --player markov2 --rounds 20000 --scaling
+    python -m bench.sweep --game dice --history my_rolls.txt --random 64
+
+A history file is read like the pages' imports (utils.move_io): CSV with one move per line, comma-separated
+moves or a `move` column, or JSON lines (.jsonl), e.g. a file exported from a game page.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from agents.backends import BACKENDS
+from agents.sweep import grid_trials, memory_trials, random_trials, sweep
+from bench.players import PLAYERS
+from bench.simulate import GAMES
+from utils.move_io import read_moves
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=sorted(GAMES), default="rps")
+    parser.add_argument("--history", help="file of recorded moves (default: synthetic player)")
+    parser.add_argument("--player", choices=sorted(PLAYERS), default="markov1")
+    parser.add_argument("--rounds", type=int, default=20_000)
+    parser.add_argument("--orders", type=int, nargs="+", default=[1])
+    parser.add_argument("--random", type=int, metavar="N", help="N random trials instead of the default grid")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--scaling", action="store_true", help="also time 1, 2, 4, ... workers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--backend", choices=sorted(BACKENDS), default="qtable", help="bot engine (markov: only --orders is swept)"
+    )
+    args = parser.parse_args()
+
+    spec = GAMES[args.game]
+    if args.history:
+        index = {a: i for i, a in enumerate(spec.actions)}
+        codes = [index[m] for m in read_moves(args.history, spec.actions)]
+    else:
+        codes = PLAYERS[args.player](args.rounds, len(spec.actions), np.random.default_rng(args.seed)).tolist()
+    targets = [spec.actions.index(spec.bot_target(a)) for a in spec.actions]
+    if args.backend == "markov":
+        trials = memory_trials(args.orders)
+    else:
+        trials = random_trials(args.random, args.orders, args.seed) if args.random else grid_trials(orders=args.orders)
+
+    worker_counts = [args.workers]
+    if args.scaling:
+        worker_counts = sorted({1, args.workers} | {2**i for i in range(1, 8) if 2**i < args.workers})
+    print(f"{args.game}: {len(codes)} moves, {len(trials)} trials")
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        result = sweep(codes, len(spec.actions), targets, trials, workers=workers, seed=args.seed, backend=args.backend)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  {workers:>3} workers  {elapsed:7.2f} s  speedup {baseline / elapsed:4.1f}x")
+
+    print("best:", result.best)
+    for row in result.results[:10]:
+        print("  ", row)
+
+
+if __name__ == "__main__":
+    main()
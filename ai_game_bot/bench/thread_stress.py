@@ -0,0 +1,146 @@
+"""
+Stress test for the shared agents: several threads train the same cached agent, as concurrent Streamlit sessions
+(or server requests) pressing Train do.
+
+    python -m bench.thread_stress --threads 8 --iterations 50 --batch 300
+    python -m bench.thread_stress --unlocked      # without the agent lock, to see what it prevents
+
+Thread t trains states "t<t>-i<i>-k<k>" (fresh ones each iteration, so the table keeps growing) with a reward
+of t + 1 for action k % 3 under AgentCache.lock, then saves. Meanwhile reader threads predict already trained
+states under the same lock, as the pages' play buttons do, and must get action k % 3. Afterwards the cached
+table must be consistent (every key's index entry points at its own row, no row holds another thread's values)
+and complete, and so must the model reloaded from disk. Exits non-zero on any error.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import random
+import tempfile
+import threading
+import time
+from typing import List
+
+from agents.q_learning import QLearningAgent
+from utils import storage
+from utils.agent_cache import AgentCache
+
+GAME = "stress"
+ACTIONS = ["rock", "paper", "scissors"]
+
+
+def _train(
+    cache: AgentCache, t: int, iterations: int, batch: int, locked: bool, done: List[int], errors: List[str]
+) -> None:
+    try:
+        for i in range(iterations):
+            states = [f"t{t}-i{i}-k{k}" for k in range(batch)]
+            actions = [ACTIONS[k % len(ACTIONS)] for k in range(batch)]
+            with cache.lock(GAME) if locked else contextlib.nullcontext():
+                agent = cache.get(GAME, ACTIONS)
+                agent.alpha, agent.gamma = 1.0, 0.0
+                agent.update_batch(states, actions, float(t + 1), states, True)
+                cache.save(GAME, agent)
+            done[t] = i + 1
+    except Exception as exc:
+        errors.append(f"thread {t}: {exc!r}")
+
+
+def _predict(
+    cache: AgentCache,
+    r: int,
+    batch: int,
+    locked: bool,
+    done: List[int],
+    stop: threading.Event,
+    predicted: List[int],
+    errors: List[str],
+) -> None:
+    rng = random.Random(r)
+    try:
+        while not stop.is_set():
+            t = rng.randrange(len(done))
+            if not done[t]:
+                continue
+            i, k = rng.randrange(done[t]), rng.randrange(batch)
+            with cache.lock(GAME) if locked else contextlib.nullcontext():
+                action = cache.get(GAME, ACTIONS).choose_action(f"t{t}-i{i}-k{k}", training=False)
+            predicted[r] += 1
+            if action != ACTIONS[k % len(ACTIONS)]:
+                errors.append(f"reader {r}: t{t}-i{i}-k{k} predicted {action}")
+    except Exception as exc:
+        errors.append(f"reader {r}: {exc!r}")
+
+
+def check(agent: QLearningAgent, threads: int, iterations: int, batch: int) -> List[str]:
+    errors = []
+    table = agent._q
+    if len(table.index) != len(table.keys):
+        errors.append(f"{len(table.index)} index entries for {len(table.keys)} keys")
+    for row, key in enumerate(table.keys):
+        if table.index.get(key) != row:
+            errors.append(f"{key}: row {row} but indexed at {table.index.get(key)}")
+            continue
+        t, _, k = (int(part[1:]) for part in key.strip('"').split("-"))  # keys are JSON-serialized states
+        expected = [float(t + 1) if a == k % len(ACTIONS) else 0.0 for a in range(len(ACTIONS))]
+        if table.values[row].tolist() != expected:
+            errors.append(f"{key}: {table.values[row].tolist()}, expected {expected}")
+    missing = threads * iterations * batch - len(table.keys)
+    if missing:
+        errors.append(f"{missing} trained states missing")
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=50, help="training calls per thread")
+    parser.add_argument("--batch", type=int, default=300, help="new states per training call")
+    parser.add_argument("--readers", type=int, default=2, help="threads predicting while the others train")
+    parser.add_argument("--unlocked", action="store_true", help="train and predict without AgentCache.lock")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as models_dir:
+        storage.MODELS_DIR = models_dir
+        cache = AgentCache(flush_interval=0.01)
+        errors: List[str] = []
+        done = [0] * args.threads  # iterations each trainer has finished
+        predicted = [0] * args.readers
+        stop = threading.Event()
+        locked = not args.unlocked
+        workers = [
+            threading.Thread(target=_train, args=(cache, t, args.iterations, args.batch, locked, done, errors))
+            for t in range(args.threads)
+        ]
+        readers = [
+            threading.Thread(
+                target=_predict, args=(cache, r, args.batch, locked, done, stop, predicted, errors), daemon=True
+            )
+            for r in range(args.readers)
+        ]
+        start = time.perf_counter()
+        for w in workers + readers:
+            w.start()
+        for w in workers:
+            w.join()
+        seconds = time.perf_counter() - start
+        stop.set()
+        for r in readers:
+            r.join()
+        cache.flush()
+        errors += check(cache.get(GAME, ACTIONS), args.threads, args.iterations, args.batch)
+        reloaded = QLearningAgent.load(storage.model_path(GAME), actions=ACTIONS)
+        errors += [f"on disk: {e}" for e in check(reloaded, args.threads, args.iterations, args.batch)]
+
+    calls = args.threads * args.iterations
+    mode = "unlocked" if args.unlocked else "locked"
+    print(f"{args.threads} threads x {args.iterations} trainings of {args.batch} new states, {mode}")
+    print(f"trainings {calls:>8} ({calls / seconds:,.0f}/s)")
+    print(f"predicts  {sum(predicted):>8} ({sum(predicted) / seconds:,.0f}/s)")
+    print(f"errors    {len(errors):>8}" + "".join(f"\n  {e}" for e in errors[:10]))
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,42 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
-
 import streamlit as st
 
-from agents.q_learning import QLearningAgent
-from utils.storage import model_path
+from agents.history_state import HistoryEncoder
+from games.registry import GAMES
+from games.widgets import (
+    dataset_panel,
+    engine_picker,
+    evaluation_panel,
+    history_view,
+    learning_aids,
+    sweep_panel,
+    vs_log_panel,
+)
+from utils.agent_cache import agent_lock, get_agent, save_agent
+from utils.move_history import MoveHistory
+from utils.move_io import train_stream
+from utils.scoreboard import VsLog
+from utils.transition_stats import TransitionStats
 
 GAME_NAME = "dice"
-ACTIONS = ["1", "2", "3", "4", "5", "6"]
+ACTIONS = GAMES[GAME_NAME].actions
+SUGGESTION_ROWS = 10  # most common situations shown in the suggestions panel
 
 
 def run() -> None:
     st.subheader("Dice Predictor (learns your roll patterns)")
     st.caption("Record your dice rolls as a sequence. Train the bot to predict your next roll.")
+    namespace = st.session_state.get("namespace")  # profile chosen in the sidebar
 
     if "dice_history" not in st.session_state:
-        st.session_state.dice_history: List[str] = []
+        st.session_state.dice_history = MoveHistory(ACTIONS)
+    if "dice_stats" not in st.session_state:
+        st.session_state.dice_stats = TransitionStats(ACTIONS)  # counts behind the suggestions panel
     if "dice_trained" not in st.session_state:
         st.session_state.dice_trained = False
+        # (engine, profile, memory) -> moves of the history already applied to that model
+        st.session_state.dice_trained_upto = {}
 
     col1, col2 = st.columns(2)
     with col1:
@@ -26,65 +44,94 @@ def run() -> None:
         move = st.selectbox("Roll", ACTIONS, index=0, key="dice_move")
         if st.button("Add roll"):
             st.session_state.dice_history.append(move)
-        st.write("Your sequence:", st.session_state.dice_history)
+            st.session_state.dice_stats.add(move)
+        with st.expander("Import / export moves"):
+            dataset_panel(GAME_NAME, ACTIONS, st.session_state.dice_history, st.session_state.dice_stats)
+        history_view(st.session_state.dice_history)
         if st.button("Clear rolls"):
-            st.session_state.dice_history = []
+            st.session_state.dice_history = MoveHistory(ACTIONS)
+            st.session_state.dice_stats = TransitionStats(ACTIONS, st.session_state.dice_stats.order)
             st.session_state.dice_trained = False
+            st.session_state.dice_trained_upto = {}
 
     with col2:
         st.markdown("**2) Train bot on your sequence**")
+        backend = engine_picker(GAME_NAME, GAMES[GAME_NAME].backend)
         alpha = st.slider("Learning rate (alpha)", 0.05, 1.0, 0.3, 0.05)
         gamma = st.slider("Discount (gamma)", 0.5, 0.99, 0.95, 0.01)
         epsilon = st.slider("Exploration (epsilon)", 0.0, 1.0, 0.1, 0.05)
-        path = model_path(GAME_NAME)
-        agent = QLearningAgent.load(path, actions=ACTIONS)
-        agent.alpha, agent.gamma, agent.epsilon = alpha, gamma, epsilon
+        epochs = st.slider("Training passes (epochs)", 1, 20, 1)
+        order = st.slider("Bot memory (last N moves)", 1, 4, 1, key="dice_order")
+        trace_decay, replay_ratio = learning_aids(GAME_NAME)
+        encoder = HistoryEncoder(ACTIONS, order)
+        agent = get_agent(GAME_NAME, ACTIONS, encoder.serialize, namespace, backend)
 
         if st.button("Train on my sequence"):
             history = st.session_state.dice_history
+            trained_key = (backend, namespace, order)  # each has its own model (or its own states in it)
+            start = st.session_state.dice_trained_upto.get(trained_key, 0)
             if len(history) < 2:
                 st.warning("Add at least 2 rolls so the bot can learn transitions.")
+            elif start >= len(history):
+                st.info("No new rolls since the last training.")
             else:
-                prev_state = "START"
-                for current in history:
-                    agent.update(prev_state, current, 1.0, current, done=False)
-                    prev_state = current
-                agent.save(path)
+                with agent_lock(GAME_NAME, namespace, backend):  # other sessions share this agent
+                    agent.alpha, agent.gamma, agent.epsilon = alpha, gamma, epsilon
+                    agent.trace_decay = trace_decay
+                    agent.set_replay(replay_ratio)
+                    # Only rolls added since the last training (streamed in chunks), after the last trained moves
+                    before = history[max(0, start - order) : start]
+                    trained = train_stream(
+                        agent, encoder, history.iter_moves(start), GAMES[GAME_NAME].target, epochs, before
+                    )
+                    save_agent(GAME_NAME, agent, namespace)
                 st.session_state.dice_trained = True
-                st.success("Bot trained and saved.")
+                st.session_state.dice_trained_upto[trained_key] = len(history)
+                st.success(f"Bot trained on {trained.rounds} new rolls ({trained.rate:,.0f} rolls/s) and saved.")
+
+        with st.expander("Find good settings (hyperparameter sweep)"):
+            sweep_panel(GAME_NAME, ACTIONS, list(range(len(ACTIONS))), st.session_state.dice_history, backend)
+
+        with st.expander("Evaluate on my moves (walk-forward)"):
+            evaluation_panel(
+                GAME_NAME,
+                ACTIONS,
+                list(range(len(ACTIONS))),
+                st.session_state.dice_history,
+                (alpha, gamma, epsilon, order),
+                backend=backend,
+            )
 
     st.divider()
     st.markdown("**3) Bot guesses your next roll**")
-    path = model_path(GAME_NAME)
-    agent = QLearningAgent.load(path, actions=ACTIONS)
+    agent = get_agent(GAME_NAME, ACTIONS, encoder.serialize, namespace, backend)
 
     if "dice_vs_state" not in st.session_state:
-        st.session_state.dice_vs_state = "START"
-        st.session_state.dice_vs_log: List[Tuple[str, str, int]] = []
+        st.session_state.dice_vs_state = encoder.start()
+        st.session_state.dice_vs_log = VsLog(ACTIONS)  # rounds vs the bot + running scoreboard
+    if st.session_state.get("dice_vs_order") != order:
+        # memory length changed: rebuild the state from the moves played so far
+        st.session_state.dice_vs_state = encoder.encode(st.session_state.dice_vs_log.last_moves(order))
+        st.session_state.dice_vs_order = order
 
     play_col, log_col = st.columns([1, 1])
     with play_col:
         your_next = st.selectbox("Your next roll", ACTIONS, index=0, key="dice_next")
         if st.button("Reveal and score", key="dice_reveal"):
-            bot_guess = agent.choose_action(st.session_state.dice_vs_state, training=False)
+            with agent_lock(GAME_NAME, namespace, backend):  # not while another session trains it
+                bot_guess = agent.choose_action(st.session_state.dice_vs_state, training=False)
             outcome = 1 if your_next == bot_guess else -1
-            st.session_state.dice_vs_log.append((your_next, bot_guess, outcome))
-            st.session_state.dice_vs_state = your_next
+            st.session_state.dice_vs_log.add(your_next, bot_guess, outcome)
+            st.session_state.dice_vs_state = encoder.push(st.session_state.dice_vs_state, your_next)
         if st.button("Reset bot session", key="dice_reset"):
-            st.session_state.dice_vs_state = "START"
-            st.session_state.dice_vs_log = []
+            st.session_state.dice_vs_state = encoder.start()
+            st.session_state.dice_vs_log = VsLog(ACTIONS)
 
     with log_col:
         if st.session_state.dice_vs_log:
-            correct = sum(1 for _, _, r in st.session_state.dice_vs_log if r == 1)
-            wrong = sum(1 for _, _, r in st.session_state.dice_vs_log if r == -1)
-            st.write(f"Results — Correct: {correct}, Wrong: {wrong}")
-            st.table(
-                {
-                    "Your roll": [m[0] for m in st.session_state.dice_vs_log],
-                    "Bot guess": [m[1] for m in st.session_state.dice_vs_log],
-                    "Score": ["Correct" if m[2] == 1 else "Wrong" for m in st.session_state.dice_vs_log],
-                }
+            vs_log_panel(
+                GAME_NAME, st.session_state.dice_vs_log, {1: "Correct", -1: "Wrong"},
+                ("Your roll", "Bot guess"), "Bot accuracy",
             )
 
     # Suggestions from your sequence
@@ -92,17 +139,11 @@ def run() -> None:
         st.divider()
         st.markdown("**Suggestions based on your sequence**")
         history = st.session_state.dice_history
-        transitions: Dict[str, Dict[str, int]] = {}
-        prev = "START"
-        for move in history:
-            transitions.setdefault(prev, {}).setdefault(move, 0)
-            transitions[prev][move] += 1
-            prev = move
-        rows = []
-        for s, dist in transitions.items():
-            total_s = sum(dist.values())
-            likely = max(dist, key=dist.get)
-            rows.append((s, likely, dist[likely] / total_s))
+        stats = st.session_state.dice_stats
+        if stats.order != order or stats.n_moves != len(history):
+            # memory length changed or the history was replaced: recount once
+            stats = st.session_state.dice_stats = TransitionStats.from_moves(ACTIONS, history, order)
+        rows = stats.top_contexts(SUGGESTION_ROWS)
         if rows:
             st.write("The bot will guess your most likely next roll in each situation.")
             st.table(
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import importlib
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+class GameInfo(NamedTuple):
+    name: str  # model file prefix (GAME_NAME)
+    title: str  # sidebar label
+    actions: List[str]
+    description: str
+    module: str  # imported on first use; must define run()
+    targets: Optional[Dict[str, str]] = None  # bot action that is right against each human move (default: the same)
+    backend: str = "qtable"  # default bot engine (agents.backends): "qtable" or "markov"
+    session_prefix: Optional[str] = None  # prefix of the page's st.session_state keys (default: name)
+
+    def target(self, move: str) -> str:
+        return self.targets[move] if self.targets else move
+
+    def session_key(self, suffix: str) -> str:
+        """Name of one of the page's session_state entries, e.g. session_key("trained_upto")."""
+        return f"{self.session_prefix or self.name}_{suffix}"
+
+    def page(self) -> Callable[[], None]:
+        """The game's page function. The module (and what it imports) is only loaded the first time."""
+        return importlib.import_module(self.module).run
+
+
+# Everything the app shell needs to know about a game, without importing its page.
+GAMES: Dict[str, GameInfo] = {
+    game.name: game
+    for game in [
+        GameInfo(
+            "rps",
+            "Rock-Paper-Scissors",
+            ["rock", "paper", "scissors"],
+            "Rock–Paper–Scissors: bot learns your transition patterns.",
+            "games.rps",
+            {"rock": "paper", "paper": "scissors", "scissors": "rock"},
+        ),
+        GameInfo(
+            "coinflip",
+            "Coin Flip",
+            ["heads", "tails"],
+            "Coin Flip Predictor: bot predicts your next heads/tails based on your sequence.",
+            "games.coinflip",
+            session_prefix="cf",
+        ),
+        GameInfo(
+            "dice",
+            "Dice Predictor",
+            ["1", "2", "3", "4", "5", "6"],
+            "Dice Predictor: bot predicts your next dice face from your roll history.",
+            "games.dice",
+        ),
+    ]
+}
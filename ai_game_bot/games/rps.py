@@ -1,19 +1,31 @@
 from __future__ import annotations
 
-import random
-from typing import Dict, List, Tuple
-
-import numpy as np
 import streamlit as st
 
-from agents.q_learning import QLearningAgent
-from utils.storage import model_path
+from agents.evaluation import score_matrix
+from agents.history_state import HistoryEncoder
+from games.registry import GAMES
+from games.widgets import (
+    dataset_panel,
+    engine_picker,
+    evaluation_panel,
+    history_view,
+    learning_aids,
+    sweep_panel,
+    vs_log_panel,
+)
+from utils.agent_cache import agent_lock, get_agent, save_agent
+from utils.move_history import MoveHistory
+from utils.move_io import train_stream
+from utils.scoreboard import VsLog
+from utils.transition_stats import TransitionStats
 
 GAME_NAME = "rps"
-ACTIONS = ["rock", "paper", "scissors"]
+ACTIONS = GAMES[GAME_NAME].actions
+SUGGESTION_ROWS = 10  # most common situations shown in the suggestions panel
 
-WIN_MAP = {"rock": "scissors", "paper": "rock", "scissors": "paper"}
-LOSE_MAP = {v: k for k, v in WIN_MAP.items()}
+LOSE_MAP = GAMES[GAME_NAME].targets  # the move that beats each move
+WIN_MAP = {v: k for k, v in LOSE_MAP.items()}
 
 
 def Beats(move: str) -> str:
@@ -26,18 +38,26 @@ def play_result(player: str, opponent: str) -> int:
     return 1 if WIN_MAP[player] == opponent else -1
 
 
+SCORES = score_matrix(ACTIONS, play_result)  # (bot move, human move) -> win / draw / loss, for the evaluator
+TARGETS = [ACTIONS.index(Beats(a)) for a in ACTIONS]  # bot action that beats each human move, by index
+
 # --- Human-then-train paradigm ---
-# State is previous human move (or "START"). Agent is trained to pick the action
+# State is the last N human moves (or "START"). Agent is trained to pick the action
 # that beats the NEXT human move, learning from human sequences.
 
 def run() -> None:
     st.subheader("Rock–Paper–Scissors (learns your patterns)")
     st.caption("Step 1: Play a few rounds. Step 2: Train bot on your rounds. Step 3: Play vs bot.")
+    namespace = st.session_state.get("namespace")  # profile chosen in the sidebar
 
     if "rps_history" not in st.session_state:
-        st.session_state.rps_history: List[str] = []  # sequence of human moves
+        st.session_state.rps_history = MoveHistory(ACTIONS)  # sequence of human moves
+    if "rps_stats" not in st.session_state:
+        st.session_state.rps_stats = TransitionStats(ACTIONS)  # counts behind the suggestions panel
     if "rps_trained" not in st.session_state:
         st.session_state.rps_trained = False
+        # (engine, profile, memory) -> moves of the history already applied to that model
+        st.session_state.rps_trained_upto = {}
 
     col1, col2 = st.columns(2)
     with col1:
@@ -45,68 +65,95 @@ def run() -> None:
         move = st.radio("Choose your move", ACTIONS, horizontal=True, key="rps_move")
         if st.button("Add round"):
             st.session_state.rps_history.append(move)
-        st.write("Your sequence:", st.session_state.rps_history)
+            st.session_state.rps_stats.add(move)
+        with st.expander("Import / export moves"):
+            dataset_panel(GAME_NAME, ACTIONS, st.session_state.rps_history, st.session_state.rps_stats)
+        history_view(st.session_state.rps_history)
         if st.button("Clear session"):
-            st.session_state.rps_history = []
+            st.session_state.rps_history = MoveHistory(ACTIONS)
+            st.session_state.rps_stats = TransitionStats(ACTIONS, st.session_state.rps_stats.order)
             st.session_state.rps_trained = False
+            st.session_state.rps_trained_upto = {}
 
     with col2:
         st.markdown("**2) Train bot on your session**")
+        backend = engine_picker(GAME_NAME, GAMES[GAME_NAME].backend)
         alpha = st.slider("Learning rate (alpha)", 0.05, 1.0, 0.3, 0.05)
         gamma = st.slider("Discount (gamma)", 0.5, 0.99, 0.95, 0.01)
         epsilon = st.slider("Exploration (epsilon)", 0.0, 1.0, 0.1, 0.05)
-        path = model_path(GAME_NAME)
-        agent = QLearningAgent.load(path, actions=ACTIONS)
-        agent.alpha, agent.gamma, agent.epsilon = alpha, gamma, epsilon
+        epochs = st.slider("Training passes (epochs)", 1, 20, 1)
+        order = st.slider("Bot memory (last N moves)", 1, 4, 1, key="rps_order")
+        trace_decay, replay_ratio = learning_aids(GAME_NAME)
+        encoder = HistoryEncoder(ACTIONS, order)
+        agent = get_agent(GAME_NAME, ACTIONS, encoder.serialize, namespace, backend)
 
         if st.button("Train on my rounds"):
             history = st.session_state.rps_history
+            trained_key = (backend, namespace, order)  # each has its own model (or its own states in it)
+            start = st.session_state.rps_trained_upto.get(trained_key, 0)
             if len(history) < 2:
                 st.warning("Add at least 2 rounds so the bot can learn transitions.")
+            elif start >= len(history):
+                st.info("No new rounds since the last training.")
             else:
-                prev = "START"
-                for current in history:
+                with agent_lock(GAME_NAME, namespace, backend):  # other sessions share this agent
+                    agent.alpha, agent.gamma, agent.epsilon = alpha, gamma, epsilon
+                    agent.trace_decay = trace_decay
+                    agent.set_replay(replay_ratio)
+                    # Only rounds added since the last training (streamed in chunks), after the last trained moves
                     # Reward the action that would beat the next human move
-                    target_action = Beats(current)
-                    agent.update(prev, target_action, 1.0, current, done=False)
-                    prev = current
-                agent.save(path)
+                    before = history[max(0, start - order) : start]
+                    trained = train_stream(agent, encoder, history.iter_moves(start), Beats, epochs, before)
+                    save_agent(GAME_NAME, agent, namespace)
                 st.session_state.rps_trained = True
-                st.success("Bot trained on your sequence and saved.")
+                st.session_state.rps_trained_upto[trained_key] = len(history)
+                st.success(f"Bot trained on {trained.rounds} new rounds ({trained.rate:,.0f} rounds/s) and saved.")
+
+        with st.expander("Find good settings (hyperparameter sweep)"):
+            sweep_panel(GAME_NAME, ACTIONS, TARGETS, st.session_state.rps_history, backend)
+
+        with st.expander("Evaluate on my moves (walk-forward)"):
+            evaluation_panel(
+                GAME_NAME,
+                ACTIONS,
+                TARGETS,
+                st.session_state.rps_history,
+                (alpha, gamma, epsilon, order),
+                SCORES,
+                backend,
+            )
 
     st.divider()
     st.markdown("**3) Play vs Bot**")
-    path = model_path(GAME_NAME)
-    agent = QLearningAgent.load(path, actions=ACTIONS)
+    agent = get_agent(GAME_NAME, ACTIONS, encoder.serialize, namespace, backend)
 
     if "rps_vs_state" not in st.session_state:
-        st.session_state.rps_vs_state = "START"
-        st.session_state.rps_vs_log: List[Tuple[str, str, int]] = []
+        st.session_state.rps_vs_state = encoder.start()
+        st.session_state.rps_vs_log = VsLog(ACTIONS)  # rounds vs the bot + running scoreboard
+    if st.session_state.get("rps_vs_order") != order:
+        # memory length changed: rebuild the state from the moves played so far
+        st.session_state.rps_vs_state = encoder.encode(st.session_state.rps_vs_log.last_moves(order))
+        st.session_state.rps_vs_order = order
 
     play_col, log_col = st.columns([1, 1])
     with play_col:
         your_move = st.selectbox("Your move", ACTIONS, index=0)
         if st.button("Play round vs Bot"):
-            bot_move = agent.choose_action(st.session_state.rps_vs_state, training=False)
+            with agent_lock(GAME_NAME, namespace, backend):  # not while another session trains it
+                bot_move = agent.choose_action(st.session_state.rps_vs_state, training=False)
             outcome = play_result(your_move, bot_move)
-            st.session_state.rps_vs_log.append((your_move, bot_move, outcome))
-            st.session_state.rps_vs_state = your_move  # next state is your last move
+            st.session_state.rps_vs_log.add(your_move, bot_move, outcome)
+            # next state is the window ending with your last move
+            st.session_state.rps_vs_state = encoder.push(st.session_state.rps_vs_state, your_move)
         if st.button("Reset vs Bot"):
-            st.session_state.rps_vs_state = "START"
-            st.session_state.rps_vs_log = []
+            st.session_state.rps_vs_state = encoder.start()
+            st.session_state.rps_vs_log = VsLog(ACTIONS)
 
     with log_col:
         if st.session_state.rps_vs_log:
-            wins = sum(1 for _, _, r in st.session_state.rps_vs_log if r == 1)
-            losses = sum(1 for _, _, r in st.session_state.rps_vs_log if r == -1)
-            draws = sum(1 for _, _, r in st.session_state.rps_vs_log if r == 0)
-            st.write(f"Results — Wins: {wins}, Losses: {losses}, Draws: {draws}")
-            st.table(
-                {
-                    "Your move": [m[0] for m in st.session_state.rps_vs_log],
-                    "Bot move": [m[1] for m in st.session_state.rps_vs_log],
-                    "Outcome": ["Win" if m[2] == 1 else ("Loss" if m[2] == -1 else "Draw") for m in st.session_state.rps_vs_log],
-                }
+            vs_log_panel(
+                GAME_NAME, st.session_state.rps_vs_log, {1: "Win", -1: "Loss", 0: "Draw"},
+                ("Your move", "Bot move"), "Your win rate",
             )
 
     # Suggestions: analyze transition frequencies and bot counters
@@ -114,19 +161,11 @@ def run() -> None:
         st.divider()
         st.markdown("**Suggestions based on your session**")
         history = st.session_state.rps_history
-        transitions: Dict[str, Dict[str, int]] = {}
-        prev = "START"
-        for move in history:
-            transitions.setdefault(prev, {}).setdefault(move, 0)
-            transitions[prev][move] += 1
-            prev = move
-        rows = []
-        total = sum(sum(d.values()) for d in transitions.values())
-        for s, dist in transitions.items():
-            total_s = sum(dist.values())
-            likely = max(dist, key=dist.get)
-            bot_counter = Beats(likely)
-            rows.append((s, likely, dist[likely] / total_s, bot_counter))
+        stats = st.session_state.rps_stats
+        if stats.order != order or stats.n_moves != len(history):
+            # memory length changed or the history was replaced: recount once
+            stats = st.session_state.rps_stats = TransitionStats.from_moves(ACTIONS, history, order)
+        rows = [(s, likely, freq, Beats(likely)) for s, likely, freq, _ in stats.top_contexts(SUGGESTION_ROWS)]
         if rows:
             st.write("The bot will exploit your most likely next move in each situation.")
             st.table({
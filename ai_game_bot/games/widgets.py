@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import streamlit as st
+
+from agents.backends import BACKEND_LABELS, BACKENDS, DEFAULT_BACKEND
+from agents.evaluation import evaluate
+from agents.sweep import grid_trials, memory_trials, random_trials, sweep
+from utils.move_history import MoveHistory
+from utils.move_io import FORMATS, IngestStats, chunked, export_lines, read_moves
+from utils.scoreboard import VsLog
+from utils.transition_stats import TransitionStats
+
+MIN_SWEEP_MOVES = 10
+MIN_EVAL_MOVES = 2
+LOG_PAGE_ROWS = 20  # rounds shown per page of the vs-bot log
+HISTORY_TAIL = 30  # latest moves shown under "Your sequence"
+
+
+def sweep_panel(
+    key: str, actions: List[str], targets: Sequence[int], history: MoveHistory, backend: str = DEFAULT_BACKEND
+) -> None:
+    """
+    Search alpha/gamma/epsilon (and bot memory) by walk-forward accuracy on the recorded history.
+    The frequency predictor has no learning settings, so for it only the bot memory is compared.
+    """
+    counting = backend == "markov"
+    mode, n_random = "Memory", 64
+    if counting:
+        st.caption("The frequency predictor ignores alpha, gamma and epsilon: this compares bot memory lengths.")
+    else:
+        mode = st.radio("Search", ["Grid", "Random"], horizontal=True, key=f"{key}_sweep_mode")
+    default_orders = [1, 2, 3, 4] if counting else [1]
+    orders = st.multiselect(
+        "Bot memory to try", [1, 2, 3, 4], default=default_orders, key=f"{key}_{backend}_sweep_orders"
+    ) or [1]
+    if mode == "Random":
+        n_random = int(st.number_input("Random trials", 8, 1024, 64, step=8, key=f"{key}_sweep_trials"))
+    if st.button("Run sweep", key=f"{key}_sweep_run"):
+        if len(history) < MIN_SWEEP_MOVES:
+            st.warning(f"Record at least {MIN_SWEEP_MOVES} moves before running a sweep.")
+        else:
+            codes = history.codes()
+            if mode == "Memory":
+                trials = memory_trials(orders)
+            else:
+                trials = grid_trials(orders=orders) if mode == "Grid" else random_trials(n_random, orders)
+            with st.spinner(f"Evaluating {len(trials)} settings on {len(codes)} moves..."):
+                result = sweep(codes, len(actions), targets, trials, backend=backend)
+                st.session_state[f"{key}_{backend}_sweep"] = result
+
+    result = st.session_state.get(f"{key}_{backend}_sweep")
+    if result is not None:
+        best = result.best
+        settings = "" if counting else f"alpha {best['alpha']}, gamma {best['gamma']}, epsilon {best['epsilon']}, "
+        st.success(
+            f"Best: {settings}memory {best['order']} — {best['accuracy']:.0%} of your moves predicted (walk-forward)"
+        )
+        st.dataframe(result.results, use_container_width=True, height=240)
+
+
+def evaluation_panel(
+    key: str,
+    actions: List[str],
+    targets: Sequence[int],
+    history: MoveHistory,
+    settings: Tuple[float, float, float, int],
+    scores: Optional[np.ndarray] = None,
+    backend: str = DEFAULT_BACKEND,
+) -> None:
+    """
+    Walk-forward replay of the recorded history with the selected engine and the current (alpha, gamma,
+    epsilon, memory) settings: accuracy, win/draw/loss rates when `scores` is given, and the learning curve.
+    """
+    if st.button("Evaluate", key=f"{key}_eval_run"):
+        if len(history) < MIN_EVAL_MOVES:
+            st.warning(f"Record at least {MIN_EVAL_MOVES} moves to evaluate.")
+        else:
+            alpha, gamma, epsilon, order = settings
+            st.session_state[f"{key}_{backend}_eval"] = evaluate(
+                history.codes(), len(actions), targets, scores, alpha, gamma, epsilon, order, backend=backend
+            )
+
+    result = st.session_state.get(f"{key}_{backend}_eval")
+    if result is not None:
+        cols = st.columns(4 if result.outcomes else 1)
+        cols[0].metric("Predicted", f"{result.accuracy:.0%}", help=f"of {result.rounds} moves")
+        if result.outcomes:
+            for col, (label, outcome) in zip(cols[1:], [("Wins", 1), ("Draws", 0), ("Losses", -1)]):
+                col.metric(label, f"{result.outcomes[outcome]:.0%}")
+        if len(result.curve) > 1:
+            st.caption("Accuracy over the course of your history")
+            st.line_chart(
+                {"Rounds": [r for r, _ in result.curve], "Accuracy": [a for _, a in result.curve]},
+                x="Rounds",
+                y="Accuracy",
+                height=200,
+            )
+
+
+def engine_picker(key: str, default: str) -> str:
+    """Bot engine for the page; each engine keeps its own model, so switching doesn't discard training."""
+    names = list(BACKENDS)
+    return st.selectbox(
+        "Bot engine",
+        names,
+        index=names.index(default),
+        format_func=BACKEND_LABELS.get,
+        key=f"{key}_backend",
+        help="The frequency predictor counts what you played after your last 0..N moves and backs off to shorter "
+        "histories while a longer one is rare; it ignores alpha/gamma and the learning aids.",
+    )
+
+
+def learning_aids(key: str) -> Tuple[float, float]:
+    """Opt-in Q(lambda) trace decay and replay ratio for the Train button (both 0: plain one-step updates)."""
+    with st.expander("Learning aids (traces, replay)"):
+        trace_decay = st.slider("Trace decay (lambda)", 0.0, 0.95, 0.0, 0.05, key=f"{key}_lambda")
+        replay_ratio = st.slider("Replayed rounds per new round", 0, 8, 0, key=f"{key}_replay")
+    return trace_decay, float(replay_ratio)
+
+
+def dataset_panel(key: str, actions: List[str], history: MoveHistory, stats: TransitionStats) -> None:
+    """Append moves from an uploaded CSV/JSONL file to the session in chunks, and download the session's moves."""
+    upload = st.file_uploader(
+        "Import moves (CSV or JSON lines)", type=["csv", "txt", "jsonl", "ndjson", "json"], key=f"{key}_upload"
+    )
+    skip_invalid = st.checkbox("Skip unknown moves instead of stopping", key=f"{key}_skip_invalid")
+    if upload is not None and st.button("Add to my moves", key=f"{key}_import"):
+        upload.seek(0)
+        ingest = IngestStats()
+        status = st.empty()
+        try:
+            for block in chunked(read_moves(upload, actions, skip_invalid=skip_invalid, stats=ingest)):
+                history.extend(block)
+                stats.extend(block)
+                ingest.rounds += len(block)
+                ingest.chunks += 1
+                status.caption(f"Importing… {ingest}")
+        except ValueError as exc:  # also covers files that aren't UTF-8 text
+            status.error(f"Import stopped: {exc}. {ingest.rounds} moves before it were added.")
+        else:
+            status.success(f"Imported {ingest}. Train the bot to learn from them.")
+
+    if len(history):
+        fmt = st.radio("Export format", FORMATS, horizontal=True, key=f"{key}_export_format")
+        if st.button("Prepare download", key=f"{key}_export"):
+            st.download_button(
+                f"Download {len(history)} moves",
+                "".join(export_lines(history.iter_moves(), fmt)),
+                file_name=f"{key}_moves.{fmt}",
+                mime="text/csv" if fmt == "csv" else "application/x-ndjson",
+                key=f"{key}_download",
+            )
+
+
+def history_view(history: MoveHistory) -> None:
+    """Move count and the latest moves, rather than the whole sequence."""
+    shown = history.tail(HISTORY_TAIL)
+    more = "… " if len(history) > len(shown) else ""
+    st.write(f"Your sequence ({len(history)} moves):", more + " ".join(shown))
+
+
+def vs_log_panel(key: str, log: VsLog, labels: Dict[int, str], columns: Tuple[str, str], rate_label: str) -> None:
+    """Scoreboard plus one page of the vs-bot log (latest rounds first), so rendering cost doesn't grow with it."""
+    st.write("Results — " + ", ".join(f"{label}: {log.counts[outcome]}" for outcome, label in labels.items()))
+    outcome, length = log.current_streak()
+    st.caption(
+        f"{rate_label}: {log.win_rate() * 100:.0f}% overall, {log.rolling_win_rate() * 100:.0f}% "
+        f"in the last {min(len(log), log.window)} rounds · Streak: {length} × {labels[outcome]} · "
+        f"Longest {labels[1].lower()} streak: {log.best_streak}"
+    )
+    n_pages = log.n_pages(LOG_PAGE_ROWS)
+    page = 0
+    if n_pages > 1:
+        page_key = f"{key}_vs_page"
+        if st.session_state.get(page_key, 1) > n_pages:  # the log was reset
+            st.session_state[page_key] = 1
+        # the page lives in session state only: no `value`, so the widget starts at min_value (1)
+        page = int(st.number_input(f"Page (1 = latest, {n_pages} total)", 1, n_pages, key=page_key)) - 1
+    rows = log.page(page, LOG_PAGE_ROWS)
+    st.table(
+        {
+            "Round": [r[0] for r in rows],
+            columns[0]: [r[1] for r in rows],
+            columns[1]: [r[2] for r in rows],
+            "Outcome": [labels[r[3]] for r in rows],
+        }
+    )
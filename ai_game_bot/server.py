@@ -0,0 +1,372 @@
+"""
+Local prediction server: keeps the game models in memory and answers JSON-lines requests (stdlib asyncio).
+
+    python -m server --port 8765          # or: python -m server --unix /tmp/ai_game_bot.sock
+
+Each request is one JSON object per line and gets one JSON line back, echoing its "id":
+
+    {"id": 1, "op": "predict", "game": "rps", "history": ["rock", "paper"], "order": 2}
+        -> {"id": 1, "ok": true, "action": "scissors"}
+    {"id": 2, "op": "record", "game": "rps", "session": "alice", "moves": ["rock", "rock"]}
+        -> {"id": 2, "ok": true, "moves": 2}
+    {"id": 3, "op": "train", "game": "rps", "session": "alice", "alpha": 0.3, "gamma": 0.95, "epochs": 1}
+        -> {"id": 3, "ok": true, "trained": 2}        (epochs 1-20; optional: "trace_decay", "replay_ratio")
+    {"id": 4, "op": "predict", "game": "rps", "session": "alice"}   (uses the session's recorded moves)
+    {"op": "stats"}, {"op": "ping"}
+
+Any request may name a "namespace" (profile) and predict/train a "backend" (bot engine: "qtable" or "markov";
+default: the game's). Errors come back as {"ok": false, "error": "..."}.
+Concurrent predicts are answered in micro-batches: while several clients are active the server collects what
+arrives within `--max-wait-ms` (up to `--max-batch`) and runs one BotAgent.choose_actions per model.
+Models are shared with the app through the same store (utils.agent_cache), and are reloaded when their files
+under MODELS_DIR change. Model lookups, loads, predictions and training run in worker threads under the
+model's agent lock, so a disk load or a long training never stalls the event loop or another model.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from agents.backends import BACKENDS
+from agents.history_state import HistoryEncoder
+from games.registry import GAMES, GameInfo
+from utils import metrics
+from utils.agent_cache import AGENT_CACHE, model_stamp
+from utils.move_history import MoveHistory
+from utils.move_io import train_stream
+from utils.storage import model_path
+
+MAX_ORDER = 4  # same range as the pages' "Bot memory" slider
+MAX_EPOCHS = 20  # same range as the pages' "Training passes" slider
+MAX_LINE = 16 * 1024 * 1024
+
+
+class Session:
+    """Moves recorded for one player and how many of them each (engine, order) has already been trained on."""
+
+    def __init__(self, actions: List[str]) -> None:
+        self.history = MoveHistory(actions)
+        self.trained_upto: Dict[Tuple[str, int], int] = {}
+
+
+class PredictionServer:
+    def __init__(self, max_batch: int = 256, max_wait: float = 0.002, reload_interval: float = 1.0) -> None:
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.reload_interval = reload_interval
+        self._queue: "asyncio.Queue[Tuple[Tuple[str, Optional[str], int, str], List[str], asyncio.Future]]" = (
+            asyncio.Queue()
+        )
+        self._sessions: Dict[Tuple[Optional[str], str, str], Session] = {}
+        self._encoders: Dict[Tuple[str, int], HistoryEncoder] = {}
+        # models in use (game, namespace, backend) -> files' stamp when last seen
+        self._stamps: Dict[Tuple[str, Optional[str], str], Any] = {}
+        # one prediction per model in a worker thread at a time, so a model held by a long training can't
+        # tie up every executor thread
+        self._model_locks: Dict[Tuple[str, Optional[str], str], asyncio.Lock] = {}
+        self._predicting: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+        self.predictions = 0
+        self.reloads = 0
+
+    # --- Connections ---
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    # requests on one connection are served concurrently, so predicts can share a batch
+                    task = asyncio.create_task(self._respond(line, writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter) -> None:
+        self.requests += 1
+        request: Dict[str, Any] = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            response = {"ok": True, **await self.dispatch(request)}
+        except (ValueError, KeyError, TypeError) as exc:
+            response = {"ok": False, "error": str(exc) if not isinstance(exc, KeyError) else f"Missing {exc}"}
+        except Exception as exc:  # every request gets a reply, whatever went wrong
+            response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        if "id" in request:
+            response["id"] = request["id"]
+        if not writer.is_closing():
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            with contextlib.suppress(ConnectionError):
+                await writer.drain()
+
+    async def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "ping":
+            return {}
+        if op == "stats":
+            return {"stats": self.stats()}
+        game = self._game(request)
+        namespace = request.get("namespace")
+        if op == "predict":
+            return {"action": await self.predict(game, namespace, request)}
+        if op == "record":
+            return {"moves": self.record(game, namespace, request)}
+        if op == "train":
+            return {"trained": await self.train(game, namespace, request)}
+        raise ValueError(f"Unknown op {op!r}")
+
+    # --- Operations ---
+    @staticmethod
+    def _game(request: Dict[str, Any]) -> GameInfo:
+        game = GAMES.get(request.get("game"))
+        if game is None:
+            raise ValueError(f"Unknown game {request.get('game')!r}, expected one of {sorted(GAMES)}")
+        return game
+
+    def _encoder(self, game: GameInfo, order: int) -> HistoryEncoder:
+        if not isinstance(order, int) or isinstance(order, bool) or not 1 <= order <= MAX_ORDER:
+            raise ValueError(f"order must be between 1 and {MAX_ORDER}")
+        encoder = self._encoders.get((game.name, order))
+        if encoder is None:
+            encoder = self._encoders[game.name, order] = HistoryEncoder(game.actions, order)
+        return encoder
+
+    def _session(self, game: GameInfo, namespace: Optional[str], request: Dict[str, Any]) -> Session:
+        key = (namespace, game.name, str(request["session"]))
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = Session(game.actions)
+        return session
+
+    @staticmethod
+    def _moves(game: GameInfo, moves: Any) -> List[str]:
+        if not isinstance(moves, list) or any(m not in game.actions for m in moves):
+            raise ValueError(f"Moves must be a list of {game.actions}")
+        return moves
+
+    @staticmethod
+    def _backend(game: GameInfo, request: Dict[str, Any]) -> str:
+        backend = request.get("backend", game.backend)
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(BACKENDS)}")
+        return backend
+
+    async def predict(self, game: GameInfo, namespace: Optional[str], request: Dict[str, Any]) -> str:
+        order = request.get("order", 1)
+        backend = self._backend(game, request)
+        self._encoder(game, order)
+        if "history" in request:
+            window = self._moves(game, request["history"])[-order:]
+        else:
+            window = self._session(game, namespace, request).history.tail(order)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((game.name, namespace, order, backend), window, future))
+        return await future
+
+    def record(self, game: GameInfo, namespace: Optional[str], request: Dict[str, Any]) -> int:
+        session = self._session(game, namespace, request)
+        session.history.extend(self._moves(game, request["moves"]))
+        return len(session.history)
+
+    async def train(self, game: GameInfo, namespace: Optional[str], request: Dict[str, Any]) -> int:
+        """
+        Train on the session's moves recorded since its last training, like the pages' Train button.
+        The moves are snapshotted here and learned in a worker thread, so predictions keep being answered.
+        """
+        session = self._session(game, namespace, request)
+        order = request.get("order", 1)
+        encoder = self._encoder(game, order)
+        backend = self._backend(game, request)
+        epochs = request.get("epochs", 1)
+        if not isinstance(epochs, int) or isinstance(epochs, bool) or not 1 <= epochs <= MAX_EPOCHS:
+            raise ValueError(f"epochs must be an integer between 1 and {MAX_EPOCHS}")
+        history, model = session.history, (backend, order)
+        start, end = session.trained_upto.get(model, 0), len(history)
+        if end - start < 1 or end < 2:
+            return 0
+        codes, before = history.codes(start, end), history[max(0, start - order) : start]
+        session.trained_upto[model] = end  # claimed now, so an overlapping train request doesn't repeat these moves
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._train_moves, game, namespace, backend, encoder, codes, before, epochs, request
+            )
+        except BaseException:
+            if session.trained_upto.get(model) == end:
+                session.trained_upto[model] = start
+            raise
+
+    @staticmethod
+    def _train_moves(
+        game: GameInfo,
+        namespace: Optional[str],
+        backend: str,
+        encoder: HistoryEncoder,
+        codes: bytes,
+        before: List[str],
+        epochs: int,
+        request: Dict[str, Any],
+    ) -> int:
+        with AGENT_CACHE.lock(game.name, namespace, backend):  # serializes with other trainers of this model
+            agent = AGENT_CACHE.get(game.name, game.actions, encoder.serialize, namespace, backend)
+            agent.alpha = float(request.get("alpha", agent.alpha))
+            agent.gamma = float(request.get("gamma", agent.gamma))
+            agent.epsilon = float(request.get("epsilon", agent.epsilon))
+            agent.trace_decay = float(request.get("trace_decay", agent.trace_decay))
+            if "replay_ratio" in request:
+                agent.set_replay(float(request["replay_ratio"]))
+            moves = (game.actions[c] for c in codes)
+            trained = train_stream(agent, encoder, moves, game.target, epochs, before)
+            AGENT_CACHE.save(game.name, agent, namespace=namespace)
+        return trained.rounds
+
+    # --- Micro-batching ---
+    async def batch_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(0)  # let requests that are already readable reach the queue
+            self._drain(batch)
+            if 1 < len(batch) < self.max_batch and self.max_wait > 0:
+                # other clients are active: wait a little for more; a lone request is answered right away
+                await asyncio.sleep(self.max_wait)
+                self._drain(batch)
+            self._run_batch(batch)
+
+    def _drain(self, batch: list) -> None:
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    def _run_batch(self, batch: list) -> None:
+        """Start one prediction per model in the batch; the loop goes on collecting the next batch meanwhile."""
+        groups: Dict[Tuple[str, Optional[str], int, str], list] = {}
+        for key, window, future in batch:
+            groups.setdefault(key, []).append((window, future))
+        for key, items in groups.items():
+            task = asyncio.create_task(self._predict_group(*key, items))
+            self._predicting.add(task)
+            task.add_done_callback(self._predicting.discard)
+        self.batches += 1
+        self.predictions += len(batch)
+
+    async def _predict_group(
+        self, game_name: str, namespace: Optional[str], order: int, backend: str, items: list
+    ) -> None:
+        game = GAMES[game_name]
+        encoder = self._encoder(game, order)
+        states = [encoder.encode(window) for window, _ in items]
+        model_lock = self._model_locks.setdefault((game_name, namespace, backend), asyncio.Lock())
+        try:
+            async with model_lock:
+                with metrics.timer("server.batch"):
+                    actions = await asyncio.get_running_loop().run_in_executor(
+                        None, self._choose_actions, game, namespace, backend, encoder, states
+                    )
+        except Exception as exc:  # answer every waiting request instead of leaving it hanging
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(ValueError(f"Prediction failed: {exc}"))
+            return
+        for (_, future), action in zip(items, actions):
+            if not future.done():
+                future.set_result(action)
+
+    def _choose_actions(
+        self, game: GameInfo, namespace: Optional[str], backend: str, encoder: HistoryEncoder, states: list
+    ) -> List[str]:
+        with AGENT_CACHE.lock(game.name, namespace, backend):  # not while a trainer is changing the table
+            agent = AGENT_CACHE.get(game.name, game.actions, encoder.serialize, namespace, backend)
+            if (game.name, namespace, backend) not in self._stamps:
+                path = model_path(game.name, namespace=namespace, backend=backend)
+                self._stamps[game.name, namespace, backend] = model_stamp(path)
+            return agent.choose_actions(states, training=False)
+
+    # --- Hot reload ---
+    async def watch_models(self) -> None:
+        """Reload models in use whose files changed on disk (another process trained or reset them)."""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await asyncio.get_running_loop().run_in_executor(None, self._reload_changed)
+
+    def _reload_changed(self) -> None:
+        for (game_name, namespace, backend), seen in list(self._stamps.items()):
+            stamp = model_stamp(model_path(game_name, namespace=namespace, backend=backend))
+            if stamp == seen:
+                continue
+            self._stamps[game_name, namespace, backend] = stamp
+            misses = AGENT_CACHE.misses
+            AGENT_CACHE.get(game_name, GAMES[game_name].actions, namespace=namespace, backend=backend)
+            if AGENT_CACHE.misses > misses:
+                self.reloads += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "predictions": self.predictions,
+            "mean_batch": self.predictions / self.batches if self.batches else 0.0,
+            "sessions": len(self._sessions),
+            "reloads": self.reloads,
+            "cache": AGENT_CACHE.stats(),
+        }
+
+
+async def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix: Optional[str] = None,
+    max_batch: int = 256,
+    max_wait: float = 0.002,
+    reload_interval: float = 1.0,
+) -> None:
+    server = PredictionServer(max_batch, max_wait, reload_interval)
+    if unix:
+        if os.path.exists(unix):
+            os.remove(unix)
+        listener = await asyncio.start_unix_server(server.handle, unix, limit=MAX_LINE)
+        where = unix
+    else:
+        listener = await asyncio.start_server(server.handle, host, port, limit=MAX_LINE)
+        where = "{}:{}".format(*listener.sockets[0].getsockname()[:2])
+    print(f"listening on {where}", flush=True)
+    background = [asyncio.create_task(server.batch_loop()), asyncio.create_task(server.watch_models())]
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        for task in background:
+            task.cancel()
+        AGENT_CACHE.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port (0 picks a free one)")
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--max-batch", type=int, default=256, help="most predicts answered in one batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="how long a batch waits to fill up")
+    parser.add_argument("--reload-interval", type=float, default=1.0, help="seconds between model file checks")
+    args = parser.parse_args()
+    try:
+        asyncio.run(
+            serve(args.host, args.port, args.unix, args.max_batch, args.max_wait_ms / 1000, args.reload_interval)
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
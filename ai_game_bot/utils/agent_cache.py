@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agents.backends import DEFAULT_BACKEND, backend_class
+from agents.base import BotAgent, Changes, merge_changes, wal_path
+from utils import metrics
+from utils.storage import MODEL_BACKENDS, model_lock, model_path
+
+FileStamp = Optional[Tuple[int, int]]
+ModelStamp = Tuple[FileStamp, FileStamp]
+
+# The log is folded into the model file once it outgrows this fraction of the model (or minimum size).
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 64 * 1024
+# Saves requested within this many seconds are coalesced into one write per model.
+FLUSH_INTERVAL = float(os.environ.get("AI_GAME_BOT_FLUSH_INTERVAL", "1.0"))
+# Optional cap on states per model ("lru" or "least-visited" eviction); unset means unbounded.
+MAX_STATES = int(os.environ["AI_GAME_BOT_MAX_STATES"]) if os.environ.get("AI_GAME_BOT_MAX_STATES") else None
+EVICTION = os.environ.get("AI_GAME_BOT_EVICTION", "lru")
+
+
+def file_stamp(path: str) -> FileStamp:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def model_stamp(path: str) -> ModelStamp:
+    return file_stamp(path), file_stamp(wal_path(path))
+
+
+class AgentCache:
+    """
+    Process-wide model store: an LRU cache of loaded agents, shared by every page and Streamlit session.
+    An entry is reused while the (mtime, size) of the model file and its log are unchanged, so saves from
+    other processes and `clear_model` are picked up on the next lookup without re-reading on every rerun.
+
+    Files are read under a shared lock and written under an exclusive one (see utils.file_lock), and saves
+    are coalesced: a burst of `save` calls for the same model becomes one write per `flush_interval`.
+
+    A cached agent is one mutable object used from every session's thread: hold `lock(...)` for the model
+    while training it and saving it, so two Train clicks don't update (and grow) the same table at once, and
+    while predicting with it, as training may move rows (evictions) or replace the value array (growth).
+    """
+
+    def __init__(self, max_entries: int = 8, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[str, Tuple[ModelStamp, BotAgent]]" = OrderedDict()
+        # path -> (agent, changed rows, compact, stale) awaiting flush
+        self._pending: Dict[str, Tuple[BotAgent, Changes, bool, bool]] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        self._agent_locks: Dict[str, threading.RLock] = {}  # model path -> lock held while training its agent
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saves = 0
+        self.flushes = 0
+
+    @metrics.timed("cache.get")
+    def get(
+        self,
+        game_name: str,
+        actions: List[str],
+        state_serializer: Callable[[Any], str] | None = None,
+        namespace: Optional[str] = None,
+        backend: str = DEFAULT_BACKEND,
+    ) -> BotAgent:
+        """The game's agent for the `backend` engine (each engine has its own model file)."""
+        path = model_path(game_name, namespace=namespace, backend=backend)
+        stamp = model_stamp(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            # Unflushed changes win over whatever is on disk.
+            if entry is not None and (entry[0] == stamp or path in self._pending):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                if state_serializer is not None:
+                    entry[1]._serialize = state_serializer
+                return entry[1]
+            self.misses += 1
+            with model_lock(path, shared=True):
+                stamp = model_stamp(path)
+                agent = backend_class(backend).load(path, actions=actions, state_serializer=state_serializer)
+            if MAX_STATES is not None:
+                agent.set_capacity(MAX_STATES, EVICTION)
+            self._put(path, stamp, agent)
+            return agent
+
+    def lock(
+        self, game_name: str, namespace: Optional[str] = None, backend: str = DEFAULT_BACKEND
+    ) -> threading.RLock:
+        """The lock serializing updates to this model's agent (kept per file, so it outlives reloads)."""
+        path = model_path(game_name, namespace=namespace, backend=backend)
+        with self._lock:
+            lock = self._agent_locks.get(path)
+            if lock is None:
+                lock = self._agent_locks[path] = threading.RLock()
+            return lock
+
+    def save(
+        self, game_name: str, agent: BotAgent, compact: bool = False, namespace: Optional[str] = None
+    ) -> None:
+        """
+        Persist `agent` as the game's model within `flush_interval` seconds (immediately if it is 0).
+        The changed rows are captured now, so the agent may keep training while the write is pending.
+        They are appended to the log; the full table is only rewritten when compacting.
+        Call it under `lock(...)` when other threads may be training the same agent.
+        """
+        path = model_path(game_name, namespace=namespace, backend=agent.backend)
+        with self._lock:
+            self.saves += 1
+            changes = agent.pop_changes()
+            # A flush may have swapped the cached agent for a compacted copy while a caller still trained the old
+            # one: the cached copy then lacks these rows and must be reloaded once they are written.
+            entry = self._entries.get(path)
+            stale = entry is None or entry[1] is not agent
+            pending = self._pending.get(path)
+            if pending is not None:
+                changes = merge_changes(pending[1], changes)
+                compact = compact or pending[2]
+                stale = stale or pending[3]
+            self._pending[path] = (agent, changes, compact, stale)
+            if self.flush_interval <= 0:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    @metrics.timed("cache.flush")
+    def flush(self) -> None:
+        """Write every pending save now."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            for path, (agent, changes, compact, stale) in pending.items():
+                self._write(path, agent, changes, compact, stale)
+                self.flushes += 1
+
+    def compact(
+        self, game_name: str, actions: List[str], namespace: Optional[str] = None, backend: str = DEFAULT_BACKEND
+    ) -> None:
+        path = model_path(game_name, namespace=namespace, backend=backend)
+        # the agent lock first, as trainers take it before calling save (which takes the cache lock)
+        with self.lock(game_name, namespace, backend), self._lock:
+            if path not in self._pending and model_stamp(path) == (None, None):
+                return  # never trained with this engine: don't create an empty model file
+            agent = self.get(game_name, actions, namespace=namespace, backend=backend)
+            self.save(game_name, agent, compact=True, namespace=namespace)
+            self.flush()
+
+    def _write(self, path: str, agent: BotAgent, changes: Changes, compact: bool, stale: bool) -> None:
+        agent, stamp = self._write_files(path, agent, changes, compact, stale)
+        self._put(path, stamp, agent)
+
+    def _write_files(
+        self, path: str, agent: BotAgent, changes: Changes, compact: bool, stale: bool = False
+    ) -> Tuple[BotAgent, ModelStamp]:
+        entry = self._entries.get(path)
+        with model_lock(path):
+            # Our copy is current only if nobody else wrote since we loaded or last saved it.
+            current = not stale and entry is not None and entry[1] is agent and entry[0] == model_stamp(path)
+            # Appending writes only how much our rows changed: loading adds every writer's changes, so training
+            # from other writers is kept, also on rows that several writers changed.
+            agent.append_log(path, changes)
+            if compact or self._should_compact(path):
+                # Rebuild from disk (model + everyone's log) rather than from a copy that may be stale. The cached
+                # agent stays: a trainer may still be changing it, and its later changes must add to what it had.
+                merged = type(agent).load(path, actions=agent.actions, state_serializer=agent._serialize)
+                merged.set_capacity(agent.max_states, agent.eviction)
+                merged.save(path)
+            stamp = model_stamp(path)
+        # A stale copy gets a stamp that can't match, so the next lookup reloads the merged rows.
+        return agent, stamp if current else (None, None)
+
+    @staticmethod
+    def _should_compact(path: str) -> bool:
+        model = file_stamp(path)
+        if model is None:
+            return True
+        log = file_stamp(wal_path(path))
+        return log is not None and log[1] > max(COMPACT_MIN_BYTES, COMPACT_RATIO * model[1])
+
+    def invalidate(self, game_name: Optional[str] = None, namespace: Optional[str] = None) -> None:
+        """Forget cached agents (of every engine) and their unsaved changes, e.g. before the files are deleted."""
+        with self._lock:
+            if game_name is None:
+                self._pending.clear()
+                self._entries.clear()
+            else:
+                for backend in MODEL_BACKENDS:
+                    path = model_path(game_name, namespace=namespace, backend=backend)
+                    self._pending.pop(path, None)
+                    self._entries.pop(path, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "saves": self.saves,
+                "flushes": self.flushes,
+                "pending": len(self._pending),
+            }
+
+    def _put(self, path: str, stamp: ModelStamp, agent: BotAgent) -> None:
+        self._entries[path] = (stamp, agent)
+        self._entries.move_to_end(path)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            if evicted in self._pending:
+                # never drop unsaved changes: write them out before forgetting the agent
+                self._write_files(evicted, *self._pending.pop(evicted))
+            self.evictions += 1
+
+
+AGENT_CACHE = AgentCache()
+atexit.register(AGENT_CACHE.flush)
+
+
+def get_agent(
+    game_name: str,
+    actions: List[str],
+    state_serializer: Callable[[Any], str] | None = None,
+    namespace: Optional[str] = None,
+    backend: str = DEFAULT_BACKEND,
+) -> BotAgent:
+    """
+    Shared agent for a game. A given `state_serializer` is attached to the cached agent, so every caller that
+    passes states must use one with the same key scheme (the games use HistoryEncoder.serialize).
+    """
+    return AGENT_CACHE.get(game_name, actions, state_serializer, namespace, backend)
+
+
+def agent_lock(game_name: str, namespace: Optional[str] = None, backend: str = DEFAULT_BACKEND) -> threading.RLock:
+    """
+    Hold while training and saving the shared agent (`with agent_lock(...): train...; save_agent(...)`),
+    and around its predictions.
+    """
+    return AGENT_CACHE.lock(game_name, namespace, backend)
+
+
+def save_agent(game_name: str, agent: BotAgent, namespace: Optional[str] = None) -> None:
+    AGENT_CACHE.save(game_name, agent, namespace=namespace)
+
+
+def compact_agent(
+    game_name: str, actions: List[str], namespace: Optional[str] = None, backend: str = DEFAULT_BACKEND
+) -> None:
+    AGENT_CACHE.compact(game_name, actions, namespace, backend)
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Advisory inter-process lock on a side file (`<path>.lock`), usable as a context manager.
+    Shared locks allow concurrent readers; on Windows every lock is exclusive.
+    Each `with` opens its own handle, so threads of one process also exclude each other.
+    """
+
+    def __init__(self, path: str, shared: bool = False) -> None:
+        self.path = path + ".lock"
+        self.shared = shared
+        self._file: Optional[IO[bytes]] = None
+
+    def __enter__(self) -> "FileLock":
+        self._file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        assert self._file is not None
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
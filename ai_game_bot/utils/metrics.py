@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple, TypeVar
+
+# Opt-in at startup: when off, `timed` returns functions undecorated, so the hot paths pay nothing.
+ENABLED = os.environ.get("AI_GAME_BOT_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_FILE = os.environ.get("AI_GAME_BOT_METRICS_FILE")  # Prometheus text file rewritten after each rerun
+PROFILE_DIR = os.environ.get("AI_GAME_BOT_PROFILE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles"
+)
+
+# Latency histogram bucket upper bounds in seconds: 1us .. 10s in 1-2.5-5 steps.
+BUCKETS: Tuple[float, ...] = tuple(float(f"{m}e{e}") for e in range(-6, 1) for m in (1, 2.5, 5)) + (10.0,)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Histogram:
+    """Per-bucket counts (the last bucket is +Inf) plus sum and count of observed latencies."""
+
+    def __init__(self) -> None:
+        self.buckets: List[int] = [0] * (len(BUCKETS) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (an overestimate of at most one bucket)."""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return bound
+        return 0.0
+
+
+_lock = threading.Lock()
+_latency: Dict[str, Histogram] = {}
+_bytes: Dict[Tuple[str, str], int] = {}  # (op, "read"/"written") -> bytes
+
+
+def observe(op: str, seconds: float) -> None:
+    with _lock:
+        hist = _latency.get(op)
+        if hist is None:
+            hist = _latency[op] = Histogram()
+        hist.observe(seconds)
+
+
+def add_bytes(op: str, direction: str, n: int) -> None:
+    if ENABLED:
+        with _lock:
+            _bytes[op, direction] = _bytes.get((op, direction), 0) + n
+
+
+def timed(op: str) -> Callable[[F], F]:
+    """Record call count and latency of the decorated function under `op` (a no-op unless ENABLED)."""
+
+    def decorate(func: F) -> F:
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(op, time.perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+@contextlib.contextmanager
+def timer(op: str) -> Iterator[None]:
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(op, time.perf_counter() - start)
+
+
+def reset() -> None:
+    with _lock:
+        _latency.clear()
+        _bytes.clear()
+
+
+def snapshot() -> List[Dict[str, Any]]:
+    """One row per operation: calls, mean/p50/p99 latency in ms and bytes read/written."""
+    with _lock:
+        ops = sorted(set(_latency) | {op for op, _ in _bytes})
+        rows = []
+        for op in ops:
+            hist = _latency.get(op, Histogram())
+            rows.append(
+                {
+                    "op": op,
+                    "calls": hist.count,
+                    "mean ms": 1000 * hist.sum / hist.count if hist.count else 0.0,
+                    "p50 ms": 1000 * hist.quantile(0.5),
+                    "p99 ms": 1000 * hist.quantile(0.99),
+                    "bytes read": _bytes.get((op, "read"), 0),
+                    "bytes written": _bytes.get((op, "written"), 0),
+                }
+            )
+        return rows
+
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP ai_game_bot_latency_seconds Call latency of agent, storage and page operations.",
+        "# TYPE ai_game_bot_latency_seconds histogram",
+    ]
+    with _lock:
+        for op, hist in sorted(_latency.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), hist.buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'ai_game_bot_latency_seconds_bucket{{op="{op}",le="{le}"}} {cumulative}')
+            lines.append(f'ai_game_bot_latency_seconds_sum{{op="{op}"}} {hist.sum!r}')
+            lines.append(f'ai_game_bot_latency_seconds_count{{op="{op}"}} {hist.count}')
+        lines += [
+            "# HELP ai_game_bot_bytes_total Bytes read and written by model storage.",
+            "# TYPE ai_game_bot_bytes_total counter",
+        ]
+        for (op, direction), n in sorted(_bytes.items()):
+            lines.append(f'ai_game_bot_bytes_total{{op="{op}",direction="{direction}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str) -> None:
+    from agents.qtable_io import atomic_write  # imported here to keep this module free of numpy
+
+    with atomic_write(path, "w") as f:
+        f.write(prometheus_text())
+
+
+def profile(func: Callable[[], Any], name: str, limit: int = 30) -> Tuple[str, str]:
+    """Run `func` under cProfile; dump the stats to PROFILE_DIR and return (path, top functions by cumulative time)."""
+    profiler = cProfile.Profile()
+    profiler.runcall(func)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return path, out.getvalue()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import weakref
+from array import array
+from typing import Iterator, List, Optional, Union
+
+# Moves kept in memory per history (one byte each); older ones are spilled to a temp file.
+HISTORY_MEMORY_MOVES = int(os.environ.get("AI_GAME_BOT_HISTORY_MEMORY", "10000"))
+SPILL_DIR = os.environ.get("AI_GAME_BOT_SPILL_DIR") or None  # None: the system temp directory
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class MoveHistory:
+    """
+    A player's move sequence stored as one action index per byte. The newest `capacity` moves live in a
+    preallocated ring buffer; when it is full the oldest half is appended to an on-disk segment, so memory per
+    history is fixed while the full sequence stays available (by index, slice or `iter_moves`) for training.
+    The segment is a temp file that is deleted with the history.
+    """
+
+    def __init__(self, actions: List[str], capacity: int = HISTORY_MEMORY_MOVES, spill_dir: Optional[str] = SPILL_DIR):
+        self.actions: List[str] = list(actions)
+        self.index = {a: i for i, a in enumerate(self.actions)}
+        self.capacity: int = max(2, capacity)
+        self.spill_dir = spill_dir
+        self._ring = array("B", bytes(self.capacity))
+        self._head = 0  # ring position of the oldest in-memory move
+        self._size = 0  # moves in memory
+        self.spilled = 0  # moves in the on-disk segment (always the oldest ones)
+        self._spill_path: Optional[str] = None
+
+    def __len__(self) -> int:
+        return self.spilled + self._size
+
+    def append(self, move: str) -> None:
+        if self._size == self.capacity:
+            self._spill(self.capacity // 2)
+        self._ring[(self._head + self._size) % self.capacity] = self.index[move]
+        self._size += 1
+
+    def extend(self, moves: Iterator[str]) -> None:
+        for move in moves:
+            self.append(move)
+
+    def _spill(self, n: int) -> None:
+        if self._spill_path is None:
+            fd, self._spill_path = tempfile.mkstemp(prefix="history-", suffix=".bin", dir=self.spill_dir)
+            os.close(fd)
+            weakref.finalize(self, _remove, self._spill_path)
+        with open(self._spill_path, "ab") as f:
+            f.write(self._ring_bytes(0, n))
+        self._head = (self._head + n) % self.capacity
+        self._size -= n
+        self.spilled += n
+
+    def _ring_bytes(self, start: int, stop: int) -> bytes:
+        """In-memory moves [start, stop), counted from the oldest one in memory."""
+        begin = (self._head + start) % self.capacity
+        end = begin + (stop - start)
+        if end <= self.capacity:
+            return self._ring[begin:end].tobytes()
+        return self._ring[begin:].tobytes() + self._ring[: end - self.capacity].tobytes()
+
+    def codes(self, start: int = 0, stop: Optional[int] = None) -> bytes:
+        """Action indices of moves [start, stop); the spilled part is read back from disk."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        start = min(max(0, start), stop)
+        data = b""
+        if start < self.spilled:
+            with open(self._spill_path, "rb") as f:
+                f.seek(start)
+                data = f.read(min(stop, self.spilled) - start)
+        if stop > self.spilled:
+            data += self._ring_bytes(max(start, self.spilled) - self.spilled, stop - self.spilled)
+        return data
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            moves = [self.actions[c] for c in self.codes(start, stop)] if start < stop else []
+            return moves[::step] if step != 1 else moves
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("history index out of range")
+        return self.actions[self.codes(item, item + 1)[0]]
+
+    def iter_moves(self, start: int = 0, chunk: int = 65536) -> Iterator[str]:
+        """Moves from `start` on, read `chunk` at a time so spilled history isn't loaded all at once."""
+        for offset in range(start, len(self), chunk):
+            for code in self.codes(offset, offset + chunk):
+                yield self.actions[code]
+
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_moves()
+
+    def tail(self, k: int) -> List[str]:
+        return self[max(0, len(self) - k) :]
@@ -0,0 +1,260 @@
+"""
+Streaming import/export of move histories as CSV or JSON lines, and chunked training from them.
+
+    python -m utils.move_io train --game rps my_moves.csv --order 2
+    python -m utils.move_io train --game coinflip flips.jsonl --order 4 --backend markov
+    python -m utils.move_io convert --game dice rolls.csv rolls.jsonl
+
+CSV: one move per cell; with a header row containing a "move" column, only that column is read.
+JSON lines: each line is a move ("rock"), a record ({"move": "rock", ...}) or a list of moves.
+Files are read line by line and trained in fixed-size chunks, so memory stays constant however long they are.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from typing import IO, Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from agents.base import BotAgent
+from agents.history_state import HistoryEncoder
+
+FORMATS = ("csv", "jsonl")
+CHUNK_MOVES = 65536  # moves per update_batch call when training from a stream
+MOVE_COLUMN = "move"
+
+Source = Union[str, IO[str], IO[bytes]]
+
+
+class IngestStats:
+    """Counts for one import or training run, for progress and throughput reports."""
+
+    def __init__(self) -> None:
+        self.rounds = 0  # valid moves trained on or written
+        self.skipped = 0  # invalid moves dropped (with skip_invalid)
+        self.chunks = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        seconds = self.seconds
+        return self.rounds / seconds if seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        skipped = f", {self.skipped:,} invalid skipped" if self.skipped else ""
+        return f"{self.rounds:,} rounds in {self.seconds:.1f} s ({self.rate:,.0f} rounds/s){skipped}"
+
+
+def detect_format(name: str) -> str:
+    return "jsonl" if os.path.splitext(name)[1].lower() in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def read_lines(source: Source) -> Iterator[str]:
+    """Text lines of a path or an open (text or binary, e.g. uploaded) file, read lazily."""
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8-sig", newline="") as f:
+            yield from f
+        return
+    if isinstance(source.read(0), bytes):
+        for line in source:
+            yield line.decode("utf-8-sig")
+    else:
+        yield from source
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """(line number, raw move) for every cell, or only the "move" column if there is a header naming it."""
+    column: Optional[int] = None
+    for line_no, row in enumerate(csv.reader(lines), start=1):
+        cells = [cell.strip() for cell in row]
+        if line_no == 1 and MOVE_COLUMN in (c.lower() for c in cells):
+            column = [c.lower() for c in cells].index(MOVE_COLUMN)
+            continue
+        if column is not None:
+            if column < len(cells) and cells[column]:
+                yield line_no, cells[column]
+            continue
+        for cell in cells:
+            if cell:
+                yield line_no, cell
+
+
+def parse_jsonl(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {line_no}: not valid JSON") from None
+        if isinstance(record, dict):
+            if MOVE_COLUMN not in record:
+                raise ValueError(f"Line {line_no}: record has no {MOVE_COLUMN!r} field")
+            yield line_no, record[MOVE_COLUMN]
+        elif isinstance(record, list):
+            for move in record:
+                yield line_no, move
+        else:
+            yield line_no, record
+
+
+def validate(
+    records: Iterable[Tuple[int, Any]],
+    actions: List[str],
+    skip_invalid: bool = False,
+    stats: Optional[IngestStats] = None,
+) -> Iterator[str]:
+    """Moves that are one of `actions` (numbers match their text, e.g. dice faces); others raise or are skipped."""
+    valid = set(actions)
+    for line_no, raw in records:
+        move = str(raw).strip()
+        if move in valid:
+            yield move
+        elif skip_invalid:
+            if stats is not None:
+                stats.skipped += 1
+        else:
+            raise ValueError(f"Line {line_no}: {move!r} is not one of {actions}")
+
+
+def read_moves(
+    source: Source,
+    actions: List[str],
+    fmt: Optional[str] = None,
+    skip_invalid: bool = False,
+    stats: Optional[IngestStats] = None,
+) -> Iterator[str]:
+    """Validated moves of a CSV/JSONL file (format from the file name unless given), one at a time."""
+    fmt = fmt or detect_format(source if isinstance(source, str) else getattr(source, "name", ""))
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+    parse = parse_jsonl if fmt == "jsonl" else parse_csv
+    return validate(parse(read_lines(source)), actions, skip_invalid, stats)
+
+
+def chunked(moves: Iterable[str], size: int = CHUNK_MOVES) -> Iterator[List[str]]:
+    moves = iter(moves)
+    while True:
+        block = list(islice(moves, size))
+        if not block:
+            return
+        yield block
+
+
+def train_stream(
+    agent: BotAgent,
+    encoder: HistoryEncoder,
+    moves: Iterable[str],
+    target: Callable[[str], str],
+    epochs: int = 1,
+    before: Sequence[str] = (),
+    chunk: int = CHUNK_MOVES,
+    stats: Optional[IngestStats] = None,
+    progress: Optional[Callable[[IngestStats], None]] = None,
+) -> IngestStats:
+    """
+    Train on `moves` as the game pages do (reward `target(move)` in the state before it), `chunk` moves per
+    update_batch. Each chunk continues from the last moves of the one before (`before` for the first), so the
+    transitions are the same as for the whole sequence; `epochs` passes are made over each chunk.
+    """
+    stats = stats or IngestStats()
+    window = deque(before, maxlen=encoder.order)
+    for block in chunked(moves, chunk):
+        states, next_states = encoder.transitions(block, before=window)
+        agent.update_batch(states, [target(m) for m in block], 1.0, next_states, False, epochs=epochs)
+        window.extend(block[-encoder.order :])
+        stats.rounds += len(block)
+        stats.chunks += 1
+        if progress is not None:
+            progress(stats)
+    return stats
+
+
+def export_lines(moves: Iterable[str], fmt: str = "csv") -> Iterator[str]:
+    """File contents for `moves`, line by line: a "move" CSV column or {"move": ...} JSON lines."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+    if fmt == "csv":
+        yield MOVE_COLUMN + "\n"
+        for move in moves:
+            yield move + "\n"
+    else:
+        for move in moves:
+            yield json.dumps({MOVE_COLUMN: move}) + "\n"
+
+
+def write_moves(moves: Iterable[str], path: str, fmt: Optional[str] = None) -> int:
+    """Stream `moves` to `path`; returns how many were written."""
+    count = 0
+
+    def counted() -> Iterator[str]:
+        nonlocal count
+        for move in moves:
+            count += 1
+            yield move
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(export_lines(counted(), fmt or detect_format(path)))
+    return count
+
+
+def main() -> None:
+    from agents.backends import BACKENDS
+    from games.registry import GAMES
+    from utils.agent_cache import AGENT_CACHE
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="train a game's model on a move file")
+    train.add_argument("source")
+    train.add_argument("--order", type=int, default=1, help="bot memory (last N moves)")
+    train.add_argument("--alpha", type=float, default=0.3)
+    train.add_argument("--gamma", type=float, default=0.95)
+    train.add_argument("--epochs", type=int, default=1)
+    train.add_argument("--chunk", type=int, default=CHUNK_MOVES)
+    train.add_argument("--namespace", help="profile whose model is trained")
+    train.add_argument("--backend", choices=sorted(BACKENDS), help="bot engine (default: the game's)")
+    convert = commands.add_parser("convert", help="validate a move file and rewrite it (CSV <-> JSON lines)")
+    convert.add_argument("source")
+    convert.add_argument("dest")
+    for command in (train, convert):
+        command.add_argument("--game", choices=sorted(GAMES), required=True)
+        command.add_argument("--format", choices=FORMATS, help="source format (default: from the file name)")
+        command.add_argument("--skip-invalid", action="store_true", help="drop unknown moves instead of failing")
+    args = parser.parse_args()
+
+    game = GAMES[args.game]
+    stats = IngestStats()
+    moves = read_moves(args.source, game.actions, args.format, args.skip_invalid, stats)
+    if args.command == "convert":
+        stats.rounds = write_moves(moves, args.dest)
+        print(f"{args.dest}: {stats}")
+        return
+
+    encoder = HistoryEncoder(game.actions, args.order)
+    agent = AGENT_CACHE.get(game.name, game.actions, encoder.serialize, args.namespace, args.backend or game.backend)
+    agent.alpha, agent.gamma = args.alpha, args.gamma
+    last_report = [0.0]
+
+    def report(progress: IngestStats) -> None:
+        if progress.seconds - last_report[0] >= 1.0:
+            last_report[0] = progress.seconds
+            print(f"  {progress}", file=sys.stderr, flush=True)
+
+    train_stream(agent, encoder, moves, game.target, args.epochs, chunk=args.chunk, stats=stats, progress=report)
+    AGENT_CACHE.save(game.name, agent, namespace=args.namespace)
+    AGENT_CACHE.flush()
+    print(f"{game.name}: trained on {stats}, {agent.n_states:,} states")
+
+
+if __name__ == "__main__":
+    main()
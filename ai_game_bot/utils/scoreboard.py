@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List, Tuple
+
+ROLLING_WINDOW = 20  # rounds in the rolling win rate
+
+
+class VsLog:
+    """
+    Rounds played against the bot, stored column-wise as action indices and outcomes (1 win, 0 draw, -1 loss),
+    with a scoreboard that is updated as each round is added: totals, a rolling win rate and streaks.
+    Nothing here walks the whole log, so reruns cost the same after thousands of rounds.
+    """
+
+    def __init__(self, actions: List[str], window: int = ROLLING_WINDOW) -> None:
+        self.actions: List[str] = list(actions)
+        self.index: Dict[str, int] = {a: i for i, a in enumerate(self.actions)}
+        self.window: int = window
+        self.human = array("B")
+        self.bot = array("B")
+        self.outcome = array("b")
+        self.counts: Dict[int, int] = {1: 0, 0: 0, -1: 0}
+        self.recent_wins: int = 0  # wins among the last `window` rounds
+        self.streak: int = 0  # current run of the same outcome
+        self.best_streak: int = 0  # longest run of wins
+
+    def __len__(self) -> int:
+        return len(self.outcome)
+
+    def add(self, human: str, bot: str, outcome: int) -> None:
+        n = len(self.outcome)
+        if n >= self.window and self.outcome[n - self.window] == 1:
+            self.recent_wins -= 1
+        if outcome == 1:
+            self.recent_wins += 1
+        self.streak = self.streak + 1 if n and self.outcome[-1] == outcome else 1
+        if outcome == 1:
+            self.best_streak = max(self.best_streak, self.streak)
+        self.human.append(self.index[human])
+        self.bot.append(self.index[bot])
+        self.outcome.append(outcome)
+        self.counts[outcome] += 1
+
+    def last_moves(self, k: int) -> List[str]:
+        """Your last `k` moves, oldest first."""
+        return [self.actions[i] for i in self.human[max(0, len(self.human) - k) :]]
+
+    def win_rate(self) -> float:
+        return self.counts[1] / len(self) if len(self) else 0.0
+
+    def rolling_win_rate(self) -> float:
+        return self.recent_wins / min(len(self), self.window) if len(self) else 0.0
+
+    def current_streak(self) -> Tuple[int, int]:
+        """(outcome, length) of the run the latest round belongs to; (0, 0) before the first round."""
+        return (self.outcome[-1], self.streak) if len(self) else (0, 0)
+
+    def page(self, page: int, page_size: int) -> List[Tuple[int, str, str, int]]:
+        """Rows (round number, your move, bot move, outcome), newest first; page 0 holds the latest rounds."""
+        stop = len(self) - page * page_size
+        start = max(0, stop - page_size)
+        return [
+            (i + 1, self.actions[self.human[i]], self.actions[self.bot[i]], self.outcome[i])
+            for i in range(stop - 1, start - 1, -1)
+        ]
+
+    def n_pages(self, page_size: int) -> int:
+        return max(1, -(-len(self) // page_size))
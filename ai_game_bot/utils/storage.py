@@ -1,24 +1,75 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+import re
+from typing import List, Optional
+
+from utils import metrics
+from utils.file_lock import FileLock
 
 MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
 MODELS_DIR = os.path.abspath(MODELS_DIR)
 
+# "json" (human-readable, default) or "binary" (memory-mapped .qtb, for large tables)
+MODEL_FORMAT = os.environ.get("AI_GAME_BOT_MODEL_FORMAT", "json")
+MODEL_EXTENSIONS = {"json": ".json", "binary": ".qtb"}
+# One model file per bot engine (see agents.backends); "qtable" keeps the original file names.
+MODEL_BACKENDS = ("qtable", "markov")
+
+# Per-user/profile models live in models/<namespace>/; no namespace means the shared models/ directory.
+_NAMESPACE_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def is_valid_namespace(namespace: str) -> bool:
+    return bool(_NAMESPACE_RE.match(namespace))
+
+
+def ensure_models_dir(namespace: Optional[str] = None) -> str:
+    directory = MODELS_DIR
+    if namespace:
+        if not is_valid_namespace(namespace):
+            raise ValueError("Profile names may only use letters, digits, '-' and '_' (max 64 characters)")
+        directory = os.path.join(MODELS_DIR, namespace)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def list_namespaces() -> List[str]:
+    if not os.path.isdir(MODELS_DIR):
+        return []
+    return sorted(n for n in os.listdir(MODELS_DIR) if os.path.isdir(os.path.join(MODELS_DIR, n)))
+
 
-def ensure_models_dir() -> str:
-    os.makedirs(MODELS_DIR, exist_ok=True)
-    return MODELS_DIR
+def model_path(
+    game_name: str, fmt: Optional[str] = None, namespace: Optional[str] = None, backend: str = "qtable"
+) -> str:
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown bot engine {backend!r}, expected one of {MODEL_BACKENDS}")
+    directory = ensure_models_dir(namespace)
+    ext = MODEL_EXTENSIONS[fmt or MODEL_FORMAT]
+    filename = f"{game_name}_{backend}{ext}"
+    return os.path.join(directory, filename)
 
 
-def model_path(game_name: str) -> str:
-    ensure_models_dir()
-    filename = f"{game_name}_qtable.json"
-    return os.path.join(MODELS_DIR, filename)
+def model_lock(path: str, shared: bool = False) -> FileLock:
+    """
+    Lock guarding a model file. Every engine and format of a game shares one `<game>.lock` in the model's
+    directory, so the lock files don't multiply with the models that could exist.
+    """
+    directory, filename = os.path.split(path)
+    game_name = re.sub(rf"_({'|'.join(MODEL_BACKENDS)})\.\w+$", "", filename)
+    return FileLock(os.path.join(directory, game_name), shared=shared)
 
 
-def clear_model(game_name: str) -> None:
-    path = model_path(game_name)
-    if os.path.exists(path):
-        os.remove(path)
+@metrics.timed("storage.clear_model")
+def clear_model(game_name: str, namespace: Optional[str] = None) -> None:
+    """Remove the game's models of every engine and format."""
+    with model_lock(model_path(game_name, namespace=namespace)):
+        for backend in MODEL_BACKENDS:
+            for fmt in MODEL_EXTENSIONS:
+                path = model_path(game_name, fmt, namespace, backend)
+                # the model file, its transaction log (see BotAgent.append_log) and the per-model lock
+                # file that older versions kept next to it
+                for file_path in (path, path + ".wal", path + ".lock"):
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from agents.history_state import HistoryEncoder
+
+
+class TransitionStats:
+    """
+    Next-move counts per order-k context (the last k moves), kept up to date one move at a time.
+    Row totals and each row's most frequent next move are maintained on insert, so adding a move is O(1)
+    and rendering only touches the contexts that occurred, never the whole history.
+    """
+
+    def __init__(self, actions: List[str], order: int = 1) -> None:
+        self.actions: List[str] = list(actions)
+        self.order: int = order
+        self.encoder = HistoryEncoder(self.actions, order)
+        n_contexts = self.encoder.span
+        self.counts = np.zeros((n_contexts, len(self.actions)), dtype=np.int32)
+        self.totals = np.zeros(n_contexts, dtype=np.int64)
+        self.best = np.zeros(n_contexts, dtype=np.int16)
+        self.context: int = self.encoder.start()
+        self.n_moves: int = 0
+
+    @classmethod
+    def from_moves(cls, actions: List[str], moves: Iterable[str], order: int = 1) -> "TransitionStats":
+        stats = cls(actions, order)
+        stats.extend(moves)
+        return stats
+
+    def add(self, move: str) -> None:
+        row = self.context - self.encoder.span
+        col = self.encoder.digit[move] - 1
+        counts = self.counts[row]
+        counts[col] += 1
+        self.totals[row] += 1
+        if counts[col] > counts[self.best[row]]:
+            self.best[row] = col
+        self.context = self.encoder.push(self.context, move)
+        self.n_moves += 1
+
+    def extend(self, moves: Iterable[str]) -> None:
+        for move in moves:
+            self.add(move)
+
+    def move_counts(self) -> np.ndarray:
+        """How often each action was played overall."""
+        return self.counts.sum(axis=0)
+
+    def top_contexts(self, limit: Optional[int] = None) -> List[Tuple[str, str, float, int]]:
+        """(context label, most likely next move, its frequency, times seen) for the most common contexts."""
+        rows = np.flatnonzero(self.totals)
+        rows = rows[np.argsort(-self.totals[rows], kind="stable")][:limit]
+        result = []
+        for row in rows.tolist():
+            best = int(self.best[row])
+            total = int(self.totals[row])
+            result.append(
+                (
+                    self.encoder.label(row + self.encoder.span),
+                    self.actions[best],
+                    int(self.counts[row, best]) / total,
+                    total,
+                )
+            )
+        return result